@@ -0,0 +1,182 @@
+"""Tools shared by the benchmarks: timing, synthetic inputs and results files."""
+
+import json
+import os
+import platform
+import statistics
+import subprocess
+import time
+
+import numpy as np
+import torch as th
+from PIL import Image
+
+from timelens import attention_average_network
+from timelens.common import event
+from timelens.config import DEVICE
+
+
+def measure(function, repeats=5, warmup=1):
+    """Returns dictionary with statistics of "function" run time in seconds."""
+    for _ in range(warmup):
+        function()
+    durations = []
+    for _ in range(repeats):
+        start_time = time.perf_counter()
+        function()
+        if DEVICE.type == "mps":
+            th.mps.synchronize()
+        durations.append(time.perf_counter() - start_time)
+    return {
+        "repeats": repeats,
+        "min": min(durations),
+        "median": statistics.median(durations),
+        "mean": statistics.mean(durations),
+    }
+
+
+def make_event_features(number_of_events, height, width, start_time=0.0, end_time=1.0, seed=0):
+    """Returns (number_of_events x 4) array of uniformly distributed events."""
+    random_state = np.random.RandomState(seed)
+    return np.stack(
+        (
+            random_state.randint(0, width, number_of_events).astype(np.float64),
+            random_state.randint(0, height, number_of_events).astype(np.float64),
+            np.sort(random_state.uniform(start_time, end_time, number_of_events)),
+            random_state.choice([-1.0, 1.0], number_of_events),
+        ),
+        axis=-1,
+    )
+
+
+def make_event_sequence(number_of_events, height, width, start_time=0.0, end_time=1.0, seed=0):
+    return event.EventSequence(
+        make_event_features(number_of_events, height, width, start_time, end_time, seed),
+        height,
+        width,
+        start_time,
+        end_time,
+    )
+
+
+def make_image(height, width, seed=0):
+    random_state = np.random.RandomState(seed)
+    return Image.fromarray(
+        random_state.randint(0, 256, (height, width, 3)).astype(np.uint8)
+    )
+
+
+def make_example(height, width, number_of_events, right_weight=0.5, seed=0):
+    """Returns example in the format of "run_timelens._pack_to_example"."""
+    return {
+        "before": {
+            "rgb_image": make_image(height, width, seed),
+            "events": make_event_sequence(
+                number_of_events, height, width, 0.0, right_weight, seed),
+        },
+        "middle": {"weight": right_weight},
+        "after": {
+            "rgb_image": make_image(height, width, seed + 1),
+            "events": make_event_sequence(
+                number_of_events, height, width, right_weight, 1.0, seed + 1),
+        },
+    }
+
+
+def make_network(seed=0):
+    """Returns "AttentionAverage" network with random weights."""
+    th.manual_seed(seed)
+    network = attention_average_network.AttentionAverage()
+    network.to(DEVICE)
+    network.eval()
+    return network
+
+
+def save_random_checkpoint(filename, seed=0):
+    """Saves checkpoint of "AttentionAverage" network with random weights."""
+    th.manual_seed(seed)
+    network = attention_average_network.AttentionAverage()
+    th.save({"networks": network.state_dict()}, filename)
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            stderr=subprocess.DEVNULL,
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment():
+    """Returns dictionary that describes the machine and the software."""
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "torch": th.__version__,
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+        "torch_threads": th.get_num_threads(),
+        "device": str(DEVICE),
+        "git_commit": _git_commit(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+
+def save_results(filename, results):
+    with open(filename, "w") as f:
+        json.dump({"environment": environment(), "results": results}, f, indent=2)
+
+
+def load_results(filename):
+    with open(filename) as f:
+        return json.load(f)["results"]
+
+
+def _key(result):
+    return result["name"], json.dumps(result["parameters"], sort_keys=True)
+
+
+def compare(results, baseline_results, tolerance=0.1):
+    """Returns list of comparisons of "results" with "baseline_results".
+
+    Results are matched by name and parameters and compared by the
+    median time. A result is a regression if it is slower than the
+    baseline by more than "tolerance" fraction.
+    """
+    baseline = {_key(result): result for result in baseline_results}
+    comparisons = []
+    for result in results:
+        if _key(result) not in baseline:
+            continue
+        ratio = result["median"] / baseline[_key(result)]["median"]
+        comparisons.append({
+            "name": result["name"],
+            "parameters": result["parameters"],
+            "baseline_median": baseline[_key(result)]["median"],
+            "median": result["median"],
+            "ratio": ratio,
+            "is_regression": ratio > 1 + tolerance,
+        })
+    return comparisons
+
+
+def print_results(results):
+    for result in results:
+        print("{:<40} {:<64} {:10.3f} ms".format(
+            result["name"], json.dumps(result["parameters"]), 1000 * result["median"]))
+
+
+def print_comparisons(comparisons):
+    for comparison in comparisons:
+        print("{:<40} {:<64} {:10.3f} -> {:10.3f} ms ({:.2f}x){}".format(
+            comparison["name"],
+            json.dumps(comparison["parameters"]),
+            1000 * comparison["baseline_median"],
+            1000 * comparison["median"],
+            comparison["ratio"],
+            "  REGRESSION" if comparison["is_regression"] else "",
+        ))
@@ -0,0 +1,117 @@
+"""End-to-end throughput and latency of "run_timelens.run_recursively".
+
+Example:
+    python -m benchmarks.end_to_end example/events example/images \\
+        --checkpoint checkpoint.bin --output end_to_end.json
+
+Without the checkpoint, the network gets random weights. The report
+contains output frames per second, percentiles of the per-frame latency,
+peak resident memory and the time spent in every processing stage.
+"""
+
+import json
+import os
+import tempfile
+import time
+
+import click
+
+from benchmarks import benchmark_tools
+from timelens import run_timelens
+from timelens.common import memory
+
+
+def run(
+        checkpoint_file,
+        root_event_folder,
+        root_image_folder,
+        root_output_folder,
+        number_of_frames_to_skip,
+        number_of_frames_to_insert,
+        **run_options
+):
+    """Returns report of the "run_recursively" run.
+
+    Durations of the stages are read from the timing report that
+    "run_recursively" saves to the "root_output_folder".
+    """
+    start_time = time.perf_counter()
+    statistics = run_timelens.run_recursively(
+        checkpoint_file,
+        root_event_folder,
+        root_image_folder,
+        root_output_folder,
+        number_of_frames_to_skip,
+        number_of_frames_to_insert,
+        timing_report=True,
+        **run_options
+    )
+    wall_time = time.perf_counter() - start_time
+    with open(os.path.join(root_output_folder, "timing_report.json")) as f:
+        stages = json.load(f)["stages"]
+    frame_latency = stages.pop("frame", {})
+    return {
+        "parameters": dict(
+            root_event_folder=os.path.abspath(root_event_folder),
+            root_image_folder=os.path.abspath(root_image_folder),
+            number_of_frames_to_skip=number_of_frames_to_skip,
+            number_of_frames_to_insert=number_of_frames_to_insert,
+            **run_options
+        ),
+        "wall_time": wall_time,
+        "output_frames": statistics["output_frames"],
+        "interpolated_frames": statistics["interpolated_frames"],
+        "output_frames_per_second": statistics["output_frames"] / wall_time,
+        "frame_latency": frame_latency,
+        "peak_rss_bytes": memory.peak_rss_bytes(),
+        "stages": stages,
+        "stage_fractions": {
+            name: stage["total"] / wall_time for name, stage in stages.items()
+        },
+    }
+
+
+def _print_report(report):
+    print("Output frames:           {}".format(report["output_frames"]))
+    print("Output frames / second:  {:.2f}".format(report["output_frames_per_second"]))
+    if report["frame_latency"]:
+        print("Frame latency p50/p95/p99: {:.1f} / {:.1f} / {:.1f} ms".format(
+            *[1000 * report["frame_latency"][key] for key in ["p50", "p95", "p99"]]))
+    print("Peak RSS:                {:.1f} MB".format(report["peak_rss_bytes"] / 2 ** 20))
+    for name, fraction in sorted(report["stage_fractions"].items(), key=lambda item: -item[1]):
+        print("  {:<24} {:8.2f} s  {:5.1f}%".format(
+            name, report["stages"][name]["total"], 100 * fraction))
+
+
+@click.command()
+@click.argument("root_event_folder", type=click.Path(exists=True))
+@click.argument("root_image_folder", type=click.Path(exists=True))
+@click.option("--checkpoint", type=click.Path(exists=True), default=None,
+              help="Checkpoint of the network. Random weights are used if not given.")
+@click.option("--output-folder", type=click.Path(), default=None,
+              help="Folder for the interpolated frames. Temporary if not given.")
+@click.option("--output", type=click.Path(), default="end_to_end.json", show_default=True,
+              help="JSON file where the report is saved.")
+@click.option("--skip", default=1, show_default=True)
+@click.option("--insert", default=1, show_default=True)
+@click.option("--tier", type=click.Choice(list(run_timelens.TIERS)), default="attention",
+              show_default=True)
+def main(root_event_folder, root_image_folder, checkpoint, output_folder, output,
+         skip, insert, tier):
+    with tempfile.TemporaryDirectory() as temporary_folder:
+        if checkpoint is None:
+            checkpoint = os.path.join(temporary_folder, "checkpoint.bin")
+            benchmark_tools.save_random_checkpoint(checkpoint)
+        if output_folder is None:
+            output_folder = os.path.join(temporary_folder, "output")
+        report = run(
+            checkpoint, root_event_folder, root_image_folder, output_folder,
+            skip, insert, tier=tier)
+    report["environment"] = benchmark_tools.environment()
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    _print_report(report)
+
+
+if __name__ == "__main__":
+    main()
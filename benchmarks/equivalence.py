@@ -0,0 +1,283 @@
+"""Numerical equivalence of the optimized paths with the reference.
+
+Example:
+    python -m benchmarks.equivalence
+    python -m benchmarks.equivalence --paths voxel_grid.out_buffer --output equivalence.json
+
+Every path in "PATHS" is an alternative way to compute the voxel grid or
+the interpolated frame. It is run on the same synthetic inputs as the
+reference, "representation.to_voxel_grid" or "AttentionAverage.run_fast"
+without buffer pool. Maximum and mean absolute errors and PSNR with
+respect to the reference are compared with the tolerances of the path.
+The command exits with code 1 if any path is out of its tolerance.
+
+Networks have seeded random weights, so no checkpoint is needed. The
+harness runs on CPU, unless "TIMELENS_DEVICE" environment variable
+selects another device.
+"""
+
+import collections
+import functools
+import json
+import math
+import os
+import sys
+
+os.environ.setdefault("TIMELENS_DEVICE", "cpu")
+
+import click
+import numpy as np
+import torch as th
+
+from benchmarks import benchmark_tools
+from timelens.common import buffer_pool, event, representation, transformers
+from timelens.config import DEVICE
+
+# Resolutions are (height, width). Sizes which are not divisible by 32 check
+# the padding of the UNets.
+DEFAULT_RESOLUTIONS = "48x64,50x70"
+DEFAULT_NUMBERS_OF_EVENTS = "0,3000"
+NUMBER_OF_BINS = 5
+
+
+class Path(collections.namedtuple(
+        "Path", ["kind", "function", "max_abs_error", "min_psnr"])):
+    """Alternative path and its tolerances.
+
+    "kind" is "voxel_grid" or "interpolation". Function of the
+    "voxel_grid" path gets event sequence and returns voxel grid.
+    Function of the "interpolation" path gets seed and raw example (see
+    "benchmark_tools.make_example") and returns the interpolated frame.
+    PSNR is not checked if "min_psnr" is None.
+    """
+
+
+def reference_voxel_grid(event_sequence):
+    return representation.to_voxel_grid(event_sequence, NUMBER_OF_BINS)
+
+
+def reference_interpolation(seed, example):
+    network = _make_network(seed)
+    return _run_fast(network, transformers.initialize_transformers(NUMBER_OF_BINS), example)
+
+
+@functools.lru_cache(maxsize=None)
+def _make_cached_network(seed):
+    return benchmark_tools.make_network(seed)
+
+
+def _make_network(seed, flow_scale=1, refinement_scale=1, pool=None):
+    """Returns network with random weights and the given options."""
+    network = _make_cached_network(seed)
+    network.flow_scale = flow_scale
+    network.refinement_scale = refinement_scale
+    network.buffer_pool = pool
+    return network
+
+
+def _run_fast(network, transform_list, example):
+    example = transformers.collate([transformers.apply_transforms(example, transform_list)])
+    with th.no_grad():
+        return network.run_fast(example)[0]
+
+
+def _voxel_grid_into_used_buffer(event_sequence):
+    out = th.full(
+        (NUMBER_OF_BINS, event_sequence._image_height, event_sequence._image_width),
+        float("nan"),
+        device=DEVICE,
+    )
+    return representation.to_voxel_grid(event_sequence, NUMBER_OF_BINS, out=out)
+
+
+def _voxel_grid_of_chunked_sequence(event_sequence):
+    events = event_sequence._events
+    chunks = [
+        events[indices[0]:indices[-1] + 1]
+        for indices in np.array_split(np.arange(len(events)), 7) if len(indices)
+    ]
+    return representation.to_voxel_grid(
+        event.ChunkedEventSequence(
+            chunks,
+            event_sequence._image_height,
+            event_sequence._image_width,
+            event_sequence.start_time(),
+            event_sequence.end_time(),
+        ),
+        NUMBER_OF_BINS,
+    )
+
+
+def _voxel_grid_with_identity_remapping(event_sequence):
+    height, width = event_sequence._image_height, event_sequence._image_width
+    y, x = np.mgrid[0:height, 0:width]
+    remapping = representation.RemappingLUT(np.stack([x, y]), height, width)
+    return representation.to_voxel_grid(event_sequence, NUMBER_OF_BINS, remapping_maps=remapping)
+
+
+def _interpolation_with_buffer_pool(seed, example):
+    pool = buffer_pool.BufferPool()
+    network = _make_network(seed, pool=pool)
+    transform_list = transformers.initialize_transformers(NUMBER_OF_BINS, pool=pool)
+    # The second run gets the buffers left over by the first one.
+    _run_fast(network, transform_list, _copy_example(example))
+    return _run_fast(network, transform_list, example)
+
+
+def _make_interpolation_with_flow_scale(flow_scale, refinement_scale=1):
+    def interpolate(seed, example):
+        network = _make_network(seed, flow_scale, refinement_scale)
+        return _run_fast(network, transformers.initialize_transformers(NUMBER_OF_BINS), example)
+    return interpolate
+
+
+def _interpolation_in_batch(seed, example):
+    """Returns frame of the example interpolated in a batch with another example."""
+    width, height = example["before"]["rgb_image"].size
+    other_example = benchmark_tools.make_example(
+        height, width, len(example["before"]["events"]), right_weight=0.25, seed=seed + 1)
+    transform_list = transformers.initialize_transformers(NUMBER_OF_BINS)
+    batch = transformers.collate([
+        transformers.apply_transforms(example, transform_list)
+        for example in [example, other_example]
+    ])
+    with th.no_grad():
+        return _make_network(seed).run_fast(batch)[0][:1]
+
+
+def _copy_example(example):
+    return {
+        packet_name: {
+            field_name: (value.copy() if hasattr(value, "copy") else value)
+            for field_name, value in packet.items()
+        }
+        for packet_name, packet in example.items()
+    }
+
+
+# Exact paths should give the same result up to the float rounding, while
+# approximate paths, such as reduced resolution flow, only need to be
+# close to the reference. Their tolerances were set for the random
+# weights and synthetic inputs of this harness.
+PATHS = collections.OrderedDict([
+    ("voxel_grid.out_buffer", Path("voxel_grid", _voxel_grid_into_used_buffer, 0.0, None)),
+    ("voxel_grid.chunked", Path("voxel_grid", _voxel_grid_of_chunked_sequence, 1e-5, None)),
+    ("voxel_grid.identity_remapping", Path(
+        "voxel_grid", _voxel_grid_with_identity_remapping, 0.0, None)),
+    ("attention.buffer_pool", Path("interpolation", _interpolation_with_buffer_pool, 1e-6, None)),
+    ("attention.batch", Path("interpolation", _interpolation_in_batch, 1e-5, None)),
+    ("attention.flow_scale_2", Path(
+        "interpolation", _make_interpolation_with_flow_scale(2), 0.5, 30.0)),
+    ("attention.flow_scale_4", Path(
+        "interpolation", _make_interpolation_with_flow_scale(4), 0.5, 25.0)),
+    ("attention.refinement_scale_2", Path(
+        "interpolation", _make_interpolation_with_flow_scale(1, 2), 0.5, 30.0)),
+])
+
+
+def compare_tensors(reference, result):
+    """Returns dictionary with errors of "result" with respect to "reference".
+
+    PSNR is computed for the value range of the reference, or for range
+    [0, 1] if the reference is constant.
+    """
+    reference = reference.detach().to("cpu", th.float64)
+    result = result.detach().to("cpu", th.float64)
+    if reference.size() != result.size():
+        raise ValueError("Sizes {} and {} are different.".format(
+            tuple(reference.size()), tuple(result.size())))
+    error = (result - reference).abs()
+    if not th.isfinite(error).all():
+        return {"max_abs_error": math.inf, "mean_abs_error": math.inf, "psnr": -math.inf}
+    value_range = float(reference.max() - reference.min()) if reference.numel() else 0.0
+    value_range = value_range or 1.0
+    mean_squared_error = float((error ** 2).mean()) if error.numel() else 0.0
+    return {
+        "max_abs_error": float(error.max()) if error.numel() else 0.0,
+        "mean_abs_error": float(error.mean()) if error.numel() else 0.0,
+        "psnr": (
+            10 * math.log10(value_range ** 2 / mean_squared_error)
+            if mean_squared_error > 0 else math.inf
+        ),
+    }
+
+
+def _is_within_tolerance(path, errors):
+    if errors["max_abs_error"] > path.max_abs_error:
+        return False
+    return path.min_psnr is None or errors["psnr"] >= path.min_psnr
+
+
+def check_path(name, resolutions, numbers_of_events, seed=0):
+    """Returns list of comparisons of the path "name" with the reference."""
+    path = PATHS[name]
+    results = []
+    for height, width in resolutions:
+        for number_of_events in numbers_of_events:
+            if path.kind == "voxel_grid":
+                event_sequence = benchmark_tools.make_event_sequence(
+                    number_of_events, height, width, seed=seed)
+                reference = reference_voxel_grid(event_sequence.copy())
+                result = path.function(event_sequence.copy())
+            else:
+                reference = reference_interpolation(
+                    seed, benchmark_tools.make_example(height, width, number_of_events, seed=seed))
+                result = path.function(
+                    seed, benchmark_tools.make_example(height, width, number_of_events, seed=seed))
+            errors = compare_tensors(reference, result)
+            results.append(dict(
+                name=name,
+                parameters={"height": height, "width": width,
+                            "number_of_events": number_of_events, "seed": seed},
+                is_within_tolerance=_is_within_tolerance(path, errors),
+                **errors))
+    return results
+
+
+def print_results(results):
+    for result in results:
+        print("{:<32} {:<72} max {:10.3g}  mean {:10.3g}  PSNR {:7.2f} dB{}".format(
+            result["name"],
+            json.dumps(result["parameters"]),
+            result["max_abs_error"],
+            result["mean_abs_error"],
+            result["psnr"],
+            "" if result["is_within_tolerance"] else "  FAILED",
+        ))
+
+
+def _parse_resolutions(text):
+    return [tuple(int(size) for size in item.split("x")) for item in text.split(",")]
+
+
+def _parse_numbers(text):
+    return [int(float(item)) for item in text.split(",")]
+
+
+@click.command()
+@click.option("--paths", default=",".join(PATHS), show_default=True,
+              help="Comma separated list of paths to check.")
+@click.option("--resolutions", default=DEFAULT_RESOLUTIONS, show_default=True,
+              help="Comma separated list of HEIGHTxWIDTH.")
+@click.option("--numbers-of-events", default=DEFAULT_NUMBERS_OF_EVENTS,
+              show_default=True, help="Comma separated list of event counts.")
+@click.option("--seed", default=0, show_default=True)
+@click.option("--output", type=click.Path(), default=None,
+              help="JSON file where results are saved.")
+def main(paths, resolutions, numbers_of_events, seed, output):
+    results = []
+    for name in paths.split(","):
+        if name not in PATHS:
+            raise click.BadParameter(
+                "Unknown path {}, known paths are {}.".format(name, list(PATHS)))
+        results += check_path(
+            name, _parse_resolutions(resolutions), _parse_numbers(numbers_of_events), seed)
+    if output is not None:
+        benchmark_tools.save_results(output, results)
+    print_results(results)
+    if not all(result["is_within_tolerance"] for result in results):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+"""Micro-benchmarks of the event processing and network hot paths.
+
+Example:
+    python -m benchmarks.micro_benchmarks --output results.json
+    python -m benchmarks.micro_benchmarks --output new.json --baseline results.json
+
+All inputs are synthetic and networks have random weights, so the
+benchmarks run offline and do not need the checkpoint.
+"""
+
+import os
+import sys
+import tempfile
+
+import click
+import numpy as np
+import torch as th
+
+from benchmarks import benchmark_tools
+from timelens.common import event, representation, transformers, warp
+from timelens.config import DEVICE
+from timelens.superslomo import unet
+
+# Resolutions are (height, width).
+DEFAULT_RESOLUTIONS = "64x96,256x352"
+DEFAULT_NUMBERS_OF_EVENTS = "10000,100000"
+
+
+def _parse_resolutions(text):
+    return [tuple(int(size) for size in item.split("x")) for item in text.split(",")]
+
+
+def _parse_numbers(text):
+    return [int(float(item)) for item in text.split(",")]
+
+
+def benchmark_load_events(numbers_of_events, repeats):
+    results = []
+    with tempfile.TemporaryDirectory() as folder:
+        for number_of_events in numbers_of_events:
+            features = benchmark_tools.make_event_features(number_of_events, 480, 640)
+            filename = os.path.join(folder, "{:06d}.npz".format(number_of_events))
+            np.savez(
+                filename,
+                x=features[:, event.X_COLUMN].astype(np.uint16),
+                y=features[:, event.Y_COLUMN].astype(np.uint16),
+                t=features[:, event.TIMESTAMP_COLUMN],
+                p=features[:, event.POLARITY_COLUMN] > 0,
+            )
+            statistics = benchmark_tools.measure(
+                lambda: event.load_events(filename), repeats)
+            results.append(dict(
+                name="event.load_events",
+                parameters={"number_of_events": number_of_events},
+                **statistics))
+            filenames = 8 * [filename]
+            statistics = benchmark_tools.measure(
+                lambda: event.EventSequence.from_npz_files(filenames, 480, 640), repeats)
+            results.append(dict(
+                name="EventSequence.from_npz_files",
+                parameters={"number_of_events": number_of_events, "number_of_files": 8},
+                **statistics))
+    return results
+
+
+def benchmark_event_sequence(numbers_of_events, repeats):
+    results = []
+    for number_of_events in numbers_of_events:
+        sequence = benchmark_tools.make_event_sequence(number_of_events, 480, 640)
+        statistics = benchmark_tools.measure(
+            lambda: sequence.split_in_two(0.5), repeats)
+        results.append(dict(
+            name="EventSequence.split_in_two",
+            parameters={"number_of_events": number_of_events},
+            **statistics))
+        timestamps = np.linspace(0.0, 1.0, 11).tolist()
+        statistics = benchmark_tools.measure(
+            lambda: list(sequence.make_sequential_iterator(timestamps)), repeats)
+        results.append(dict(
+            name="EventSequence.make_sequential_iterator",
+            parameters={"number_of_events": number_of_events, "number_of_intervals": 10},
+            **statistics))
+    return results
+
+
+def benchmark_to_voxel_grid(resolutions, numbers_of_events, repeats):
+    results = []
+    for height, width in resolutions:
+        for number_of_events in numbers_of_events:
+            sequence = benchmark_tools.make_event_sequence(number_of_events, height, width)
+            statistics = benchmark_tools.measure(
+                lambda: representation.to_voxel_grid(sequence), repeats)
+            results.append(dict(
+                name="representation.to_voxel_grid",
+                parameters={"height": height, "width": width,
+                            "number_of_events": number_of_events},
+                **statistics))
+    return results
+
+
+def benchmark_backwarp_2d(resolutions, repeats):
+    results = []
+    for height, width in resolutions:
+        th.manual_seed(0)
+        source = th.rand(2, 3, height, width, device=DEVICE)
+        displacement = 4 * th.randn(2, 2, height, width, device=DEVICE)
+        statistics = benchmark_tools.measure(
+            lambda: warp.backwarp_2d(source, displacement[:, 0], displacement[:, 1]),
+            repeats)
+        results.append(dict(
+            name="warp.backwarp_2d",
+            parameters={"height": height, "width": width},
+            **statistics))
+    return results
+
+
+def benchmark_unet(resolutions, repeats):
+    results = []
+    th.manual_seed(0)
+    network = unet.UNet(2 * 3 + 2 * 5, 3, False).to(DEVICE).eval()
+    for height, width in resolutions:
+        network_input = th.rand(1, 2 * 3 + 2 * 5, height, width, device=DEVICE)
+        with th.no_grad():
+            statistics = benchmark_tools.measure(lambda: network(network_input), repeats)
+        results.append(dict(
+            name="UNet.forward",
+            parameters={"height": height, "width": width},
+            **statistics))
+    return results
+
+
+def benchmark_attention_average(resolutions, numbers_of_events, repeats):
+    results = []
+    network = benchmark_tools.make_network()
+    transform_list = transformers.initialize_transformers()
+    for height, width in resolutions:
+        for number_of_events in numbers_of_events:
+            example = benchmark_tools.make_example(height, width, number_of_events)
+            example = transformers.collate(
+                [transformers.apply_transforms(example, transform_list)])
+            with th.no_grad():
+                statistics = benchmark_tools.measure(
+                    lambda: network.run_fast(example), repeats)
+            results.append(dict(
+                name="AttentionAverage.run_fast",
+                parameters={"height": height, "width": width,
+                            "number_of_events": number_of_events},
+                **statistics))
+    return results
+
+
+def run_benchmarks(resolutions, numbers_of_events, repeats):
+    return (
+        benchmark_load_events(numbers_of_events, repeats)
+        + benchmark_event_sequence(numbers_of_events, repeats)
+        + benchmark_to_voxel_grid(resolutions, numbers_of_events, repeats)
+        + benchmark_backwarp_2d(resolutions, repeats)
+        + benchmark_unet(resolutions, repeats)
+        + benchmark_attention_average(resolutions, numbers_of_events, repeats)
+    )
+
+
+@click.command()
+@click.option("--output", type=click.Path(), default="micro_benchmarks.json",
+              show_default=True, help="JSON file where results are saved.")
+@click.option("--baseline", type=click.Path(exists=True), default=None,
+              help="JSON file with results to compare with.")
+@click.option("--resolutions", default=DEFAULT_RESOLUTIONS, show_default=True,
+              help="Comma separated list of HEIGHTxWIDTH.")
+@click.option("--numbers-of-events", default=DEFAULT_NUMBERS_OF_EVENTS,
+              show_default=True, help="Comma separated list of event counts.")
+@click.option("--repeats", default=5, show_default=True)
+@click.option("--tolerance", default=0.1, show_default=True,
+              help="Relative slowdown with respect to the baseline that is "
+                   "reported as regression.")
+def main(output, baseline, resolutions, numbers_of_events, repeats, tolerance):
+    results = run_benchmarks(
+        _parse_resolutions(resolutions), _parse_numbers(numbers_of_events), repeats)
+    benchmark_tools.save_results(output, results)
+    benchmark_tools.print_results(results)
+    if baseline is not None:
+        comparisons = benchmark_tools.compare(
+            results, benchmark_tools.load_results(baseline), tolerance)
+        print("\nComparison with {}:".format(baseline))
+        benchmark_tools.print_comparisons(comparisons)
+        if any(comparison["is_regression"] for comparison in comparisons):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,267 @@
+"""Generator of synthetic event and frame sequences.
+
+Example:
+    python -m benchmarks.synthetic_dataset data --height 480 --width 640 \\
+        --frame-rate 25 --duration 2 --event-rate 2e6 --motion translation
+    python -m benchmarks.end_to_end data/events data/images
+
+The sequence is written in the layout read by "HybridStorage.from_folders":
+
+    data/images/<sequence>/000000.png, 000001.png, ..., timestamp.txt
+    data/events/<sequence>/000000.npz, 000001.npz, ...
+
+The i-th event file holds events between the i-th and (i+1)-th frames,
+with "x", "y", "t" and "p" keys as read by "event.load_events".
+Timestamps are in microseconds.
+
+The scene is a smooth periodic color texture that moves according to the
+motion pattern. Events are sampled where the log intensity changes, in
+proportion to the change, and a fraction of them is uniform noise. The
+output depends only on the parameters and the seed. Frames and event
+files are written one interval at a time, so the sequences can be much
+larger than the memory.
+"""
+
+import os
+
+import click
+import numpy as np
+from PIL import Image
+
+MOTIONS = ["translation", "rotation", "static"]
+
+
+def _make_periodic_texture(height, width, random_state, smoothness=0.05):
+    """Returns (height x width x 3) smooth texture in [0.1, 1] that tiles the plane."""
+    frequency_y = np.fft.fftfreq(height)[:, None]
+    frequency_x = np.fft.fftfreq(width)[None, :]
+    lowpass = np.exp(-(frequency_y ** 2 + frequency_x ** 2) / (2 * smoothness ** 2))
+    texture = np.empty((height, width, 3))
+    for channel in range(3):
+        white_noise = random_state.standard_normal((height, width))
+        texture[..., channel] = np.real(np.fft.ifft2(np.fft.fft2(white_noise) * lowpass))
+    texture -= texture.min()
+    texture /= texture.max()
+    return 0.1 + 0.9 * texture
+
+
+class Scene(object):
+    """Moving periodic texture."""
+
+    def __init__(self, height, width, motion, speed, random_state):
+        """Returns object of Scene class.
+
+        Args:
+            motion: one of "MOTIONS".
+            speed: pixels per second for the translation and
+                   radians per second for the rotation.
+        """
+        if motion not in MOTIONS:
+            raise ValueError('"motion" should be one of {}.'.format(MOTIONS))
+        self._texture = _make_periodic_texture(height, width, random_state)
+        self._log_intensity = np.log(self._texture.mean(axis=-1))
+        self._height, self._width = height, width
+        self._motion = motion
+        self._speed = speed
+        self._direction = random_state.uniform(0, 2 * np.pi)
+        self._y, self._x = np.mgrid[0:height, 0:width].astype(np.float64)
+
+    def _source_coordinates(self, time):
+        if self._motion == "translation":
+            distance = self._speed * time
+            return (
+                self._y + distance * np.sin(self._direction),
+                self._x + distance * np.cos(self._direction),
+            )
+        if self._motion == "rotation":
+            angle = self._speed * time
+            y = self._y - self._height / 2.0
+            x = self._x - self._width / 2.0
+            return (
+                np.cos(angle) * y - np.sin(angle) * x + self._height / 2.0,
+                np.sin(angle) * y + np.cos(angle) * x + self._width / 2.0,
+            )
+        return self._y, self._x
+
+    def _sample(self, texture, time):
+        y, x = self._source_coordinates(time)
+        top, left = np.floor(y), np.floor(x)
+        bottom_weight, right_weight = (y - top)[..., None], (x - left)[..., None]
+        top, left = top.astype(np.int64) % self._height, left.astype(np.int64) % self._width
+        bottom, right = (top + 1) % self._height, (left + 1) % self._width
+        if texture.ndim == 2:
+            bottom_weight, right_weight = bottom_weight[..., 0], right_weight[..., 0]
+        return (
+            (1 - bottom_weight) * (1 - right_weight) * texture[top, left]
+            + (1 - bottom_weight) * right_weight * texture[top, right]
+            + bottom_weight * (1 - right_weight) * texture[bottom, left]
+            + bottom_weight * right_weight * texture[bottom, right]
+        )
+
+    def render(self, time):
+        """Returns (height x width x 3) image at "time" in seconds."""
+        return self._sample(self._texture, time)
+
+    def log_intensity(self, time):
+        """Returns (height x width) log intensity at "time" in seconds.
+
+        It is sampled from the log of the texture intensity, which is cheaper
+        than rendering and close enough for sampling the events.
+        """
+        return self._sample(self._log_intensity, time)
+
+
+def _sample_events(
+        scene, start_time, end_time, number_of_events, number_of_substeps,
+        noise_fraction, random_state
+):
+    """Returns x, y, t, p of events in [start_time, end_time) interval.
+
+    The interval is split into substeps. Motion events are distributed
+    between substeps and pixels in proportion to the absolute change
+    of the log intensity.
+    """
+    height, width = scene._height, scene._width
+    substep_times = np.linspace(start_time, end_time, number_of_substeps + 1)
+    changes = []
+    log_intensity = scene.log_intensity(substep_times[0])
+    for substep_end_time in substep_times[1:]:
+        next_log_intensity = scene.log_intensity(substep_end_time)
+        changes.append((next_log_intensity - log_intensity).ravel())
+        log_intensity = next_log_intensity
+    change_per_substep = np.array([np.abs(change).sum() for change in changes])
+
+    number_of_noise_events = int(round(noise_fraction * number_of_events))
+    if change_per_substep.sum() == 0:
+        number_of_noise_events = number_of_events
+    number_of_motion_events = number_of_events - number_of_noise_events
+    if number_of_motion_events > 0:
+        motion_events_per_substep = random_state.multinomial(
+            number_of_motion_events, change_per_substep / change_per_substep.sum())
+    else:
+        motion_events_per_substep = np.zeros(number_of_substeps, dtype=np.int64)
+    noise_events_per_substep = random_state.multinomial(
+        number_of_noise_events, np.full(number_of_substeps, 1.0 / number_of_substeps))
+
+    xs, ys, ts, ps = [], [], [], []
+    for index, change in enumerate(changes):
+        substep_start_time, substep_end_time = substep_times[index], substep_times[index + 1]
+        number_of_motion_events = motion_events_per_substep[index]
+        number_of_noise_events = noise_events_per_substep[index]
+        pixels = np.empty(0, dtype=np.int64)
+        if number_of_motion_events > 0:
+            magnitude = np.abs(change)
+            pixels = random_state.choice(
+                change.size, number_of_motion_events, p=magnitude / magnitude.sum())
+        noise_pixels = random_state.randint(0, height * width, number_of_noise_events)
+        polarity = np.concatenate((
+            change[pixels] > 0,
+            random_state.rand(number_of_noise_events) > 0.5,
+        ))
+        pixels = np.concatenate((pixels, noise_pixels))
+        timestamps = random_state.uniform(substep_start_time, substep_end_time, pixels.size)
+        order = np.argsort(timestamps, kind="stable")
+        ys.append((pixels[order] // width).astype(np.uint16))
+        xs.append((pixels[order] % width).astype(np.uint16))
+        ts.append(timestamps[order])
+        ps.append(polarity[order])
+    return np.concatenate(xs), np.concatenate(ys), np.concatenate(ts), np.concatenate(ps)
+
+
+def _save_frame(filename, image):
+    Image.fromarray(np.round(255 * image).astype(np.uint8)).save(filename)
+
+
+def generate_sequence(
+        event_folder,
+        image_folder,
+        height=240,
+        width=320,
+        frame_rate=25.0,
+        duration=1.0,
+        event_rate=1e6,
+        motion="translation",
+        speed=None,
+        noise_fraction=0.1,
+        number_of_substeps=8,
+        is_compressed=False,
+        seed=0,
+):
+    """Writes synthetic sequence to "event_folder" and "image_folder".
+
+    Args:
+        frame_rate: frames per second.
+        duration: duration of the sequence in seconds.
+        event_rate: events per second.
+        speed: pixels per second for the translation and radians per second
+               for the rotation. By default, the texture moves by 2 pixels
+               between frames, or rotates by 1 degree.
+        noise_fraction: fraction of events at random locations with random
+                        polarity.
+        number_of_substeps: number of steps between two frames at which
+                            the scene is rendered to sample the events.
+    """
+    os.makedirs(event_folder, exist_ok=True)
+    os.makedirs(image_folder, exist_ok=True)
+    if speed is None:
+        speed = 2.0 * frame_rate if motion == "translation" else np.deg2rad(1.0) * frame_rate
+    scene = Scene(height, width, motion, speed, np.random.RandomState(seed))
+    number_of_frames = int(round(duration * frame_rate)) + 1
+    timestamps = np.arange(number_of_frames) / frame_rate
+    save = np.savez_compressed if is_compressed else np.savez
+
+    _save_frame(os.path.join(image_folder, "{:06d}.png".format(0)), scene.render(0.0))
+    for index, (start_time, end_time) in enumerate(zip(timestamps[:-1], timestamps[1:])):
+        random_state = np.random.RandomState([seed, index])
+        x, y, t, p = _sample_events(
+            scene,
+            start_time,
+            end_time,
+            int(round(event_rate * (end_time - start_time))),
+            number_of_substeps,
+            noise_fraction,
+            random_state,
+        )
+        save(os.path.join(event_folder, "{:06d}.npz".format(index)),
+             x=x, y=y, t=1e6 * t, p=p)
+        _save_frame(os.path.join(image_folder, "{:06d}.png".format(index + 1)),
+                    scene.render(end_time))
+    np.savetxt(os.path.join(image_folder, "timestamp.txt"), 1e6 * timestamps, fmt="%.3f")
+
+
+@click.command()
+@click.argument("root_folder", type=click.Path())
+@click.option("--sequence", default="synthetic", show_default=True,
+              help="Name of the leaf folder of the sequence.")
+@click.option("--height", default=240, show_default=True)
+@click.option("--width", default=320, show_default=True)
+@click.option("--frame-rate", default=25.0, show_default=True, help="Frames per second.")
+@click.option("--duration", default=1.0, show_default=True, help="Seconds.")
+@click.option("--event-rate", default=1e6, show_default=True, help="Events per second.")
+@click.option("--motion", type=click.Choice(MOTIONS), default="translation",
+              show_default=True)
+@click.option("--speed", type=float, default=None,
+              help="Pixels per second for translation, radians per second for rotation.")
+@click.option("--noise-fraction", default=0.1, show_default=True)
+@click.option("--compressed", is_flag=True, help="Save compressed event files.")
+@click.option("--seed", default=0, show_default=True)
+def main(root_folder, sequence, height, width, frame_rate, duration, event_rate,
+         motion, speed, noise_fraction, compressed, seed):
+    generate_sequence(
+        os.path.join(root_folder, "events", sequence),
+        os.path.join(root_folder, "images", sequence),
+        height=height,
+        width=width,
+        frame_rate=frame_rate,
+        duration=duration,
+        event_rate=event_rate,
+        motion=motion,
+        speed=speed,
+        noise_fraction=noise_fraction,
+        is_compressed=compressed,
+        seed=seed,
+    )
+
+
+if __name__ == "__main__":
+    main()
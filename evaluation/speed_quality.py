@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+speed_quality.py
+
+Script Python per confrontare velocità (fps) e qualità (PSNR, SSIM) di
+diverse configurazioni di TimeLens sugli stessi dati.
+
+Per ogni configurazione lo script esegue `run_timelens.run_recursively`
+saltando `skip` frame e inserendone altrettanti: i frame saltati fanno da
+ground truth per i frame interpolati. Il risultato è una tabella
+
+    configuration,fps,psnr,ssim
+
+stampata a schermo (in formato Markdown) e salvata in un file CSV.
+"fps" è il numero di frame interpolati diviso per il tempo totale
+dell'esecuzione (caricamento e salvataggio inclusi).
+"""
+
+import argparse
+import collections
+import csv
+import glob
+import os
+import sys
+import time
+from os.path import dirname, join
+
+import numpy as np
+from PIL import Image
+from skimage.metrics import peak_signal_noise_ratio, structural_similarity
+
+sys.path.append(dirname(dirname(os.path.abspath(__file__))))
+from timelens import run_timelens  # noqa: E402
+from timelens.common import os_tools  # noqa: E402
+
+# Ogni configurazione è un insieme di argomenti di `run_recursively`.
+CONFIGURATIONS = collections.OrderedDict(
+    (tier, {"tier": tier}) for tier in run_timelens.TIERS
+)
+# Stima del flusso ottico (e del suo raffinamento) a risoluzione ridotta.
+for scale in [2, 4]:
+    CONFIGURATIONS["attention_flow_{}x".format(scale)] = {
+        "tier": "attention", "flow_scale": scale}
+    CONFIGURATIONS["attention_flow_refinement_{}x".format(scale)] = {
+        "tier": "attention", "flow_scale": scale, "refinement_scale": scale}
+# Decimazione degli eventi oltre il budget per finestra prima della voxelizzazione.
+for budget in [100000, 20000]:
+    CONFIGURATIONS["attention_event_budget_{}".format(budget)] = {
+        "tier": "attention", "event_budget": budget}
+# Rete eseguita solo sulle tile con eventi, le altre sono interpolate linearmente.
+for tile_size in [64, 128]:
+    CONFIGURATIONS["attention_tiles_{}".format(tile_size)] = {
+        "tier": "attention", "tile_size": tile_size}
+# Anteprima: rete eseguita a risoluzione ridotta e frame interpolati ingranditi.
+for scale in [2, 4]:
+    CONFIGURATIONS["attention_preview_{}x".format(scale)] = {
+        "tier": "attention", "preview_scale": scale}
+
+
+def compute_metrics(root_image_folder, root_output_folder, number_of_frames_to_skip):
+    """Restituisce liste di PSNR e SSIM dei frame interpolati rispetto ai frame saltati."""
+    list_psnr, list_ssim = [], []
+    for leaf_image_folder in os_tools.find_leaf_folders(root_image_folder):
+        relative_path = os.path.relpath(leaf_image_folder, root_image_folder)
+        gt_files = sorted(glob.glob(join(leaf_image_folder, "*.png")))
+        pred_files = sorted(glob.glob(join(root_output_folder, relative_path, "*.png")))
+        for index, (gt_path, pred_path) in enumerate(zip(gt_files, pred_files)):
+            # I frame di bordo non sono interpolati.
+            if index % (number_of_frames_to_skip + 1) == 0:
+                continue
+            gt_img = np.array(Image.open(gt_path).convert("RGB"))
+            pred_img = np.array(Image.open(pred_path).convert("RGB"))
+            list_psnr.append(peak_signal_noise_ratio(gt_img, pred_img, data_range=255))
+            list_ssim.append(structural_similarity(
+                gt_img, pred_img, data_range=255, channel_axis=-1))
+    return list_psnr, list_ssim
+
+
+def evaluate_configuration(
+        checkpoint_file,
+        root_event_folder,
+        root_image_folder,
+        root_output_folder,
+        number_of_frames_to_skip,
+        configuration,
+):
+    """Esegue TimeLens con la configurazione data e restituisce fps, PSNR e SSIM."""
+    start_time = time.perf_counter()
+    run_timelens.run_recursively(
+        checkpoint_file,
+        root_event_folder,
+        root_image_folder,
+        root_output_folder,
+        number_of_frames_to_skip,
+        number_of_frames_to_skip,
+        **configuration
+    )
+    elapsed_time = time.perf_counter() - start_time
+    list_psnr, list_ssim = compute_metrics(
+        root_image_folder, root_output_folder, number_of_frames_to_skip)
+    return len(list_psnr) / elapsed_time, np.mean(list_psnr), np.mean(list_ssim)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Confronto velocità / qualità di TimeLens.")
+    parser.add_argument("checkpoint_file")
+    parser.add_argument("root_event_folder")
+    parser.add_argument("root_image_folder")
+    parser.add_argument("root_output_folder",
+                        help="Cartella in cui viene creata una sottocartella per configurazione.")
+    parser.add_argument("--skip", type=int, default=1,
+                        help="Numero di frame saltati e poi interpolati (default: 1).")
+    parser.add_argument("--configurations", nargs="+", default=list(CONFIGURATIONS),
+                        choices=list(CONFIGURATIONS),
+                        help="Configurazioni da valutare (default: tutte).")
+    parser.add_argument("--csv", type=str, default="speed_quality.csv",
+                        help="Path del file CSV di output (default: speed_quality.csv).")
+    args = parser.parse_args()
+
+    rows = []
+    for name in args.configurations:
+        fps, psnr, ssim = evaluate_configuration(
+            args.checkpoint_file,
+            args.root_event_folder,
+            args.root_image_folder,
+            join(args.root_output_folder, name),
+            args.skip,
+            CONFIGURATIONS[name],
+        )
+        rows.append([name, fps, psnr, ssim])
+
+    with open(args.csv, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["configuration", "fps", "psnr", "ssim"])
+        writer.writerows(rows)
+
+    print("\n| configuration | fps | PSNR | SSIM |")
+    print("|---|---|---|---|")
+    for name, fps, psnr, ssim in rows:
+        print(f"| {name} | {fps:.2f} | {psnr:.2f} | {ssim:.4f} |")
+
+
+if __name__ == "__main__":
+    main()
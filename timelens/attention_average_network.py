@@ -1,10 +1,11 @@
 import torch as th
 import torch.nn.functional as F
 from timelens import refine_warp_network, warp_network
+from timelens.common import buffer_pool, profiling, timing
 from timelens.superslomo import unet
 
 
-def _pack_input_for_attention_computation(example):
+def _pack_input_for_attention_computation(example, pool=None):
     fusion = example["middle"]["fusion"]
     number_of_examples, _, height, width = fusion.size()
 
@@ -25,7 +26,7 @@ def _pack_input_for_attention_computation(example):
         weight.view(-1, 1, 1, 1).expand(number_of_examples, 1, height, width).type(fusion.dtype),
     ]
 
-    return th.cat(tensors, dim=1)
+    return buffer_pool.pack(pool, buffer_pool.ATTENTION_INPUT, tensors, dim=1)
 
 
 def _compute_weighted_average(attention, before_refined, after_refined, fusion):
@@ -46,29 +47,35 @@ class AttentionAverage(refine_warp_network.RefineWarp):
         warp_network.Warp.__init__(self)
         self.fusion_network = unet.UNet(2 * 3 + 2 * 5, 3, False)
         self.flow_refinement_network = unet.UNet(9, 4, False)
+        self.refinement_scale = 1
         self.attention_network = unet.UNet(14, 3, False)
 
     def run_fast(self, example):
         example['middle']['before_refined_warped'], \
             example['middle']['after_refined_warped'] = refine_warp_network.RefineWarp.run_fast(self, example)
 
-        attention_scores = self.attention_network(
-            _pack_input_for_attention_computation(example)
-        )
-        attention = F.softmax(attention_scores, dim=1)
-        average = _compute_weighted_average(
-            attention,
-            example['middle']['before_refined_warped'],
-            example['middle']['after_refined_warped'],
-            example['middle']['fusion']
-        )
+        with profiling.record_function("attention"):
+            network_input = _pack_input_for_attention_computation(example, self.buffer_pool)
+            with timing.stage("attention_network"):
+                attention_scores = self.attention_network(network_input)
+            attention = F.softmax(attention_scores, dim=1)
+            average = _compute_weighted_average(
+                attention,
+                example['middle']['before_refined_warped'],
+                example['middle']['after_refined_warped'],
+                example['middle']['fusion']
+            )
         return average, attention
 
+    def interpolate(self, example):
+        average, _ = self.run_fast(example)
+        return average
+
     def run_attention_averaging(self, example):
         refine_warp_network.RefineWarp.run_and_pack_to_example(self, example)
-        attention_scores = self.attention_network(
-            _pack_input_for_attention_computation(example)
-        )
+        network_input = _pack_input_for_attention_computation(example, self.buffer_pool)
+        with timing.stage("attention_network"):
+            attention_scores = self.attention_network(network_input)
         attention = F.softmax(attention_scores, dim=1)
         average = _compute_weighted_average(
             attention,
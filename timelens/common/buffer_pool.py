@@ -0,0 +1,98 @@
+"""Pool of preallocated tensors that are reused from frame to frame."""
+
+import torch as th
+
+from timelens.config import DEVICE
+
+# Names of the network input slabs. Transformers write voxel grids directly
+# into slices of these slabs, and the packing functions of the networks
+# find them already in place.
+FLOW_INPUT = "flow_input"
+FUSION_INPUT = "fusion_input"
+WARP_SOURCE = "warp_source"
+SECOND_WARP_SOURCE = "second_warp_source"
+REFINE_INPUT = "refine_input"
+ATTENTION_INPUT = "attention_input"
+
+
+class BufferPool(object):
+    """Stores one tensor per name, size, type and device.
+
+    Tensors are allocated on the first request and returned as they are
+    on the following requests, so their content is whatever was written
+    into them last. Since the size is part of the key, every resolution
+    gets its own set of buffers.
+    """
+
+    def __init__(self):
+        self._buffers = {}
+
+    def __len__(self):
+        return len(self._buffers)
+
+    def get(self, name, size, dtype=th.float32, device=DEVICE):
+        key = (name, tuple(size), dtype, str(device))
+        if key not in self._buffers:
+            self._buffers[key] = th.empty(size, dtype=dtype, device=device)
+        return self._buffers[key]
+
+    def nbytes(self):
+        return sum(
+            buffer.element_size() * buffer.nelement()
+            for buffer in self._buffers.values()
+        )
+
+    def clear(self):
+        self._buffers.clear()
+
+
+def _strides_of_non_singleton_dimensions(tensor):
+    return [
+        stride for size, stride in zip(tensor.size(), tensor.stride()) if size != 1
+    ]
+
+
+def _is_same_memory(first, second):
+    return (
+        first.device == second.device
+        and first.dtype == second.dtype
+        and first.data_ptr() == second.data_ptr()
+        and first.size() == second.size()
+        and _strides_of_non_singleton_dimensions(first)
+        == _strides_of_non_singleton_dimensions(second)
+    )
+
+
+def cat(tensors, dim, out=None):
+    """Concatenates tensors along "dim", in-place if "out" is given.
+
+    Unlike "th.cat", tensors that are already views of the corresponding
+    slice of "out" are not copied. This allows to fill parts of the
+    output in advance, e.g. by computing voxel grids directly into it.
+    """
+    if out is None:
+        return th.cat(tensors, dim=dim)
+    offset = 0
+    for tensor in tensors:
+        size = tensor.size(dim)
+        target = out.narrow(dim, offset, size)
+        if not _is_same_memory(target, tensor):
+            target.copy_(tensor)
+        offset += size
+    if offset != out.size(dim):
+        raise ValueError('Size of "out" does not match size of tensors.')
+    return out
+
+
+def pack(pool, name, tensors, dim):
+    """Returns "tensors" concatenated along "dim".
+
+    If "pool" is given, the result is written into the pooled buffer
+    with the "name", otherwise a new tensor is allocated.
+    """
+    if pool is None:
+        return th.cat(tensors, dim=dim)
+    size = list(tensors[0].size())
+    size[dim] = sum(tensor.size(dim) for tensor in tensors)
+    out = pool.get(name, size, tensors[0].dtype, tensors[0].device)
+    return cat(tensors, dim, out)
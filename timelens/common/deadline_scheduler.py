@@ -0,0 +1,95 @@
+"""Chooses how to compute frames to meet a per-frame latency budget."""
+
+import collections
+import json
+
+
+class DeadlineScheduler(object):
+    """Picks an execution path for every pair of boundary frames.
+
+    Paths are names of alternative ways to compute a frame, ordered from
+    the most accurate (and slowest) to the cheapest. The scheduler keeps
+    an exponential moving average of the measured latency of every path
+    and picks the most accurate path which is expected to fit into the
+    budget. A path that was not measured yet is expected to fit.
+
+    A path that missed the deadline is not tried again, until the path
+    in use has been used for "probe_interval" frames with latency below
+    "headroom" fraction of the budget. Then the estimate of the next more
+    accurate path is forgotten, so it is probed once more.
+    """
+
+    def __init__(self, paths, budget, smoothing=0.3, headroom=0.7, probe_interval=50):
+        """Returns object of DeadlineScheduler class.
+
+        Args:
+            paths: list of path names, the most accurate first.
+            budget: per-frame latency budget in seconds.
+            smoothing: weight of the last measurement in the moving average.
+        """
+        if not paths:
+            raise ValueError("There should be at least one path.")
+        self._paths = list(paths)
+        self._budget = budget
+        self._smoothing = smoothing
+        self._headroom = headroom
+        self._probe_interval = probe_interval
+        self._latency = {}
+        self._frames_with_headroom = 0
+        self._frames = []
+
+    def _is_expected_to_fit(self, path):
+        return path not in self._latency or self._latency[path] <= self._budget
+
+    def choose_path(self):
+        for path in self._paths:
+            if self._is_expected_to_fit(path):
+                return path
+        return self._paths[-1]
+
+    def record(self, path, latency):
+        """Records "latency" in seconds of a frame computed with "path"."""
+        if path in self._latency:
+            self._latency[path] += self._smoothing * (latency - self._latency[path])
+        else:
+            self._latency[path] = latency
+        self._frames.append(
+            {"path": path, "latency": latency, "missed": latency > self._budget}
+        )
+        if latency < self._headroom * self._budget:
+            self._frames_with_headroom += 1
+        else:
+            self._frames_with_headroom = 0
+        if self._frames_with_headroom >= self._probe_interval:
+            self._frames_with_headroom = 0
+            path_index = self._paths.index(path)
+            if path_index > 0:
+                self._latency.pop(self._paths[path_index - 1], None)
+
+    def number_of_misses(self):
+        return sum(frame["missed"] for frame in self._frames)
+
+    def report(self):
+        """Returns dictionary with summary and per-frame paths and latencies."""
+        return {
+            "budget": self._budget,
+            "number_of_frames": len(self._frames),
+            "number_of_misses": self.number_of_misses(),
+            "frames_per_path": dict(
+                collections.Counter(frame["path"] for frame in self._frames)
+            ),
+            "frames": self._frames,
+        }
+
+    def to_file(self, filename):
+        with open(filename, "w") as f:
+            json.dump(self.report(), f, indent=2)
+
+    def __str__(self):
+        report = self.report()
+        return "Deadline {:.1f} ms missed by {} of {} frames, frames per path: {}".format(
+            1000 * report["budget"],
+            report["number_of_misses"],
+            report["number_of_frames"],
+            report["frames_per_path"],
+        )
@@ -1,4 +1,8 @@
+import collections
+import concurrent.futures
+import json
 import os
+import zipfile
 
 import numpy as np
 from PIL import Image
@@ -9,6 +13,8 @@ TIMESTAMP_COLUMN = 2
 X_COLUMN = 0
 Y_COLUMN = 1
 POLARITY_COLUMN = 3
+# Sidecar index of the event files, see "EventFileIndex".
+INDEX_FILENAME = "event_index.json"
 
 
 def save_events(events, file):
@@ -56,75 +62,399 @@ def load_events(file):
     return events
 
 
+def _read_array_header(file, name):
+    """Returns shape and dtype of the array "name" in ".npz" file."""
+    with zipfile.ZipFile(file) as archive, archive.open(name + ".npy") as f:
+        version = np.lib.format.read_magic(f)
+        if version == (1, 0):
+            shape, _, dtype = np.lib.format.read_array_header_1_0(f)
+        else:
+            shape, _, dtype = np.lib.format.read_array_header_2_0(f)
+    return shape, dtype
+
+
+def number_of_events_in_file(file):
+    """Returns number of events in ".npz" file, reading only the array header."""
+    shape, _ = _read_array_header(file, "t")
+    return int(np.prod(shape))
+
+
+def _coordinate_dtype(dtype):
+    """Returns dtype of "EventColumns" coordinates for coordinates of "dtype"."""
+    if np.issubdtype(dtype, np.integer) or np.issubdtype(dtype, np.bool_):
+        return np.uint16
+    return np.float64
+
+
+def load_event_columns(file):
+    """Loads events from ".npz" file to "EventColumns".
+
+    Unlike "load_events", coordinates are not converted to float64.
+    """
+    tmp = np.load(file, allow_pickle=True)
+    x, y = tmp["x"].reshape((-1,)), tmp["y"].reshape((-1,))
+    return EventColumns(
+        x.astype(_coordinate_dtype(x.dtype), copy=False),
+        y.astype(_coordinate_dtype(y.dtype), copy=False),
+        tmp["t"].astype(np.float64, copy=False).reshape((-1,)),
+        tmp["p"].astype(np.int8).reshape((-1,)) * np.int8(2) - np.int8(1),
+    )
+
+
+def load_events_into(file, out):
+    """Loads events from ".npz" file into "out" "EventColumns".
+
+    "out" should have as many events as there are in the file.
+    """
+    tmp = np.load(file, allow_pickle=True)
+    out.x[:] = tmp["x"].reshape((-1,))
+    out.y[:] = tmp["y"].reshape((-1,))
+    out.t[:] = tmp["t"].reshape((-1,))
+    out.p[:] = tmp["p"].astype(np.int8).reshape((-1,)) * np.int8(2) - np.int8(1)
+
+
+class EventColumns(object):
+    """Events stored as separate typed columns.
+
+    Coordinates "x" and "y" are uint16 (float64 for non-integer
+    coordinates), timestamps "t" are float64 and polarities "p" are int8
+    in {-1, 1}. An event takes 13 bytes instead of 32 bytes of a row of
+    the (N x 4) float64 "features" array.
+    """
+
+    __slots__ = ("x", "y", "t", "p")
+
+    def __init__(self, x, y, t, p):
+        self.x = x
+        self.y = y
+        self.t = t
+        self.p = p
+
+    def __len__(self):
+        return self.t.shape[0]
+
+    def __getitem__(self, index):
+        """Returns events selected by slice or mask. Slices are views."""
+        return EventColumns(self.x[index], self.y[index], self.t[index], self.p[index])
+
+    @property
+    def nbytes(self):
+        return self.x.nbytes + self.y.nbytes + self.t.nbytes + self.p.nbytes
+
+    def copy(self):
+        return EventColumns(
+            np.copy(self.x), np.copy(self.y), np.copy(self.t), np.copy(self.p)
+        )
+
+    def to_features(self):
+        """Returns (N x 4) float64 array with X_COLUMN, Y_COLUMN... columns."""
+        features = np.empty((len(self), 4))
+        features[:, X_COLUMN] = self.x
+        features[:, Y_COLUMN] = self.y
+        features[:, TIMESTAMP_COLUMN] = self.t
+        features[:, POLARITY_COLUMN] = self.p
+        return features
+
+    @classmethod
+    def empty(cls, number_of_events, coordinate_dtype=np.uint16):
+        return cls(
+            np.empty(number_of_events, dtype=coordinate_dtype),
+            np.empty(number_of_events, dtype=coordinate_dtype),
+            np.empty(number_of_events, dtype=np.float64),
+            np.empty(number_of_events, dtype=np.int8),
+        )
+
+    @classmethod
+    def from_features(cls, features):
+        """Returns columns of (N x 4) "features" array."""
+        x, y = features[:, X_COLUMN], features[:, Y_COLUMN]
+        coordinate_dtype = np.uint16
+        if not (
+                np.array_equal(x, x.astype(np.uint16)) and np.array_equal(y, y.astype(np.uint16))
+        ):
+            coordinate_dtype = np.float64
+        return cls(
+            x.astype(coordinate_dtype),
+            y.astype(coordinate_dtype),
+            features[:, TIMESTAMP_COLUMN].astype(np.float64),
+            features[:, POLARITY_COLUMN].astype(np.int8),
+        )
+
+    @classmethod
+    def concatenate(cls, list_of_columns):
+        return cls(*[
+            np.concatenate([getattr(columns, name) for columns in list_of_columns])
+            for name in cls.__slots__
+        ])
+
+
+def crop_event_columns(columns, cropping_data):
+    """Returns events inside of the rectangle, with coordinates relative to it.
+
+    Args:
+        cropping_data: (top, left, height, width) of the rectangle.
+    """
+    top, left, height, width = cropping_data
+    is_inside = (
+        (columns.x >= left) & (columns.x < left + width)
+        & (columns.y >= top) & (columns.y < top + height)
+    )
+    return EventColumns(
+        (columns.x[is_inside] - left).astype(columns.x.dtype),
+        (columns.y[is_inside] - top).astype(columns.y.dtype),
+        columns.t[is_inside],
+        columns.p[is_inside],
+    )
+
+
+def _reversed_columns(columns, end_time):
+    """Returns new columns with events of "columns" reversed in time."""
+    return EventColumns(
+        columns.x[::-1].copy(),
+        columns.y[::-1].copy(),
+        end_time - columns.t[::-1],
+        -columns.p[::-1],
+    )
+
+
+def _describe_event_file(file):
+    """Returns number of events and first and last timestamps of ".npz" file.
+
+    Only the timestamps are decompressed. Timestamps of an empty file are None.
+    """
+    timestamps = np.load(file, allow_pickle=True)["t"].astype(np.float64).reshape((-1,))
+    if len(timestamps) == 0:
+        return 0, None, None
+    return len(timestamps), float(timestamps[0]), float(timestamps[-1])
+
+
+class EventFileIndex(object):
+    """Numbers of events and first and last timestamps of event files.
+
+    The index lets to find the files with events of a time interval
+    without opening the other files. It is saved to "INDEX_FILENAME" in
+    the event folder, and entries of the files that changed since (by
+    modification time or size) are rebuilt by "from_folder".
+
+    Files should be in the oldest-first order, as expected by
+    "EventJITSequence".
+    """
+
+    def __init__(self, filenames, numbers_of_events, first_timestamps, last_timestamps):
+        self.filenames = list(filenames)
+        self.numbers_of_events = np.asarray(numbers_of_events, dtype=np.int64)
+        self.first_timestamps = np.asarray(first_timestamps, dtype=np.float64)
+        self.last_timestamps = np.asarray(last_timestamps, dtype=np.float64)
+        # Empty files have NaN timestamps and are left out of the search.
+        self._non_empty = np.flatnonzero(self.numbers_of_events > 0)
+
+    def __len__(self):
+        return len(self.filenames)
+
+    def file_range(self, start_time, end_time):
+        """Returns indices of files with events in [start_time, end_time).
+
+        Empty files are not included. Search takes logarithmic time.
+        """
+        start_index = np.searchsorted(
+            self.last_timestamps[self._non_empty], start_time, side="left"
+        )
+        end_index = np.searchsorted(
+            self.first_timestamps[self._non_empty], end_time, side="left"
+        )
+        return self._non_empty[start_index:max(start_index, end_index)]
+
+    def filenames_in_time_range(self, start_time, end_time):
+        return [self.filenames[index] for index in self.file_range(start_time, end_time)]
+
+    def number_of_events(self, start_time=-np.inf, end_time=np.inf):
+        """Returns number of events in files with events in [start_time, end_time).
+
+        Files are not read, so it is an upper bound of the number of
+        events in the interval, unless the interval covers all events.
+        """
+        return int(self.numbers_of_events[self.file_range(start_time, end_time)].sum())
+
+    @classmethod
+    def from_folder(cls, folder, event_file_template="{:06d}.npz"):
+        """Returns index of the event files, updating the saved index if needed.
+
+        If the index can not be saved, e.g. because the folder is read
+        only, it is only returned.
+        """
+        filenames = os_tools.make_glob_filename_iterator(
+            os.path.join(folder, event_file_template)
+        )
+        index_filename = os.path.join(folder, INDEX_FILENAME)
+        try:
+            with open(index_filename) as f:
+                saved_entries = json.load(f)["files"]
+        except (OSError, ValueError, KeyError):
+            saved_entries = {}
+        entries = {}
+        for filename in filenames:
+            name = os.path.basename(filename)
+            status = os.stat(filename)
+            entry = saved_entries.get(name)
+            if (
+                    entry is None
+                    or entry["mtime_ns"] != status.st_mtime_ns
+                    or entry["size"] != status.st_size
+            ):
+                number_of_events, first_timestamp, last_timestamp = _describe_event_file(filename)
+                entry = {
+                    "mtime_ns": status.st_mtime_ns,
+                    "size": status.st_size,
+                    "number_of_events": number_of_events,
+                    "first_timestamp": first_timestamp,
+                    "last_timestamp": last_timestamp,
+                }
+            entries[name] = entry
+        if entries != saved_entries:
+            try:
+                with open(index_filename, "w") as f:
+                    json.dump({"files": entries}, f)
+            except OSError:
+                pass
+        file_entries = [entries[os.path.basename(filename)] for filename in filenames]
+        return cls(
+            filenames,
+            [entry["number_of_events"] for entry in file_entries],
+            [_none_to_nan(entry["first_timestamp"]) for entry in file_entries],
+            [_none_to_nan(entry["last_timestamp"]) for entry in file_entries],
+        )
+
+
+def _none_to_nan(value):
+    return np.nan if value is None else value
+
+
 class EventJITSequenceIterator(object):
     """JIT loading"""
 
-    def __init__(self, filenames):
+    def __init__(self, filenames, read_ahead=2, cropping_data=None):
+        """Returns object of EventJITSequenceIterator class.
+
+        Args:
+            read_ahead: number of files that are loaded in background
+                        thread, while the current file is processed.
+            cropping_data: if given, events of every file are cropped
+                           when it is loaded, see "crop_event_columns".
+        """
         self.filenames = filenames
+        self.read_ahead = read_ahead
+        self.cropping_data = cropping_data
 
     def __len__(self):
         return len(self.filenames)
 
     def __getitem__(self, index):
-        return load_events(self.filenames[index])
+        return self._load(self.filenames[index])
+
+    def _load(self, filename):
+        columns = load_event_columns(filename)
+        if self.cropping_data is not None:
+            columns = crop_event_columns(columns, self.cropping_data)
+        return columns
 
     def __iter__(self):
-        for filename in self.filenames:
-            features = load_events(filename)
-            yield features
+        if self.read_ahead == 0:
+            for filename in self.filenames:
+                yield self._load(filename)
+            return
+        with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+            futures = collections.deque()
+            for filename in self.filenames:
+                futures.append(executor.submit(self._load, filename))
+                if len(futures) > self.read_ahead:
+                    yield futures.popleft().result()
+            while futures:
+                yield futures.popleft().result()
 
 
 class EventJITSequence(object):
-    """JIT File Sequential Reader"""
+    """JIT File Sequential Reader
 
-    def __init__(self, filenames, height, width):
-        self._evseq = EventJITSequenceIterator(filenames)
+    Event files are read one by one, so only events of the current
+    interval and of "read_ahead" files are held in memory. Events of
+    the intervals are not copied, see "ChunkedEventSequence".
+
+    If "index" ("EventFileIndex") is given, files without events
+    between the first and the last timestamps of the iterator are not read.
+    """
+
+    def __init__(self, filenames, height, width, read_ahead=2, index=None,
+                 cropping_data=None):
+        self._evseq = EventJITSequenceIterator(filenames, read_ahead, cropping_data)
         self._image_height = height
         self._image_width = width
+        self._index = index
 
     def make_sequential_iterator(self, timestamps):
-        ev_seq_iter = iter(self._evseq)
-        curbuf = next(ev_seq_iter)
-        for start_timestamp, end_timestamp in zip(timestamps[:-1], timestamps[1:]):
-            events = []
-            #search for first event
-            while not len(curbuf) or curbuf[-1, 2] < start_timestamp:
-                curbuf = next(ev_seq_iter)
-            start_index = np.searchsorted(curbuf[:, 2], start_timestamp, side='right')
-            events.append(curbuf[start_index:])
-            curbuf = next(ev_seq_iter)
-            #search for last event
-            while not len(curbuf) or curbuf[-1, 2] < end_timestamp:
-                events.append(curbuf)
-                curbuf = next(ev_seq_iter)
-            #cut to last events
-            end_index = np.searchsorted(curbuf[:, 2], end_timestamp, side='right')
-            events.append(curbuf[:end_index])
-            curbuf = curbuf[end_index:]
-
-            features = np.concatenate(events)
+        """Returns iterator over sub-sequences of events.
 
-            yield EventSequence(
-                features=features,
-                image_height=self._image_height,
-                image_width=self._image_width,
-                start_time=start_timestamp,
-                end_time=end_timestamp,
+        It returns the same sub-sequences as
+        "EventSequence.make_sequential_iterator", i.e. events with
+        timestamps in [timestamps[i], timestamps[i + 1]) intervals. An
+        interval can span any number of files, including empty ones.
+        Intervals after the last event are empty. Sub-sequences are
+        "ChunkedEventSequence" with views of the file arrays.
+        """
+        if len(timestamps) < 2:
+            raise ValueError("There should be at least two timestamps")
+        files = iter(self._evseq)
+        if self._index is not None:
+            files = iter(EventJITSequenceIterator(
+                self._index.filenames_in_time_range(timestamps[0], timestamps[-1]),
+                self._evseq.read_ahead,
+                self._evseq.cropping_data,
+            ))
+        # Non-empty columns with events that are read, but not returned yet.
+        buffered = []
+        is_exhausted = False
+        for start_timestamp, end_timestamp in zip(timestamps[:-1], timestamps[1:]):
+            # Files are in the oldest-first order, so all events before
+            # "end_timestamp" are read when the last read event is not before it.
+            while not is_exhausted and (
+                    not buffered or buffered[-1].t[-1] < end_timestamp
+            ):
+                columns = next(files, None)
+                if columns is None:
+                    is_exhausted = True
+                elif len(columns):
+                    buffered.append(columns)
+            sequence = ChunkedEventSequence(
+                buffered, self._image_height, self._image_width, start_timestamp, end_timestamp
             )
+            buffered = sequence.filter_by_time_range(end_timestamp, np.inf).chunks()
+            yield sequence.filter_by_time_range(start_timestamp, end_timestamp)
+
+    def filter_by_time_range(self, start_time, end_time):
+        """Returns "ChunkedEventSequence" with events in [start_time, end_time).
+
+        With the index, only files with events in the interval are read.
+        """
+        return next(self.make_sequential_iterator([start_time, end_time]))
 
     @classmethod
     def from_folder(
-            cls, folder, image_height, image_width, event_file_template="{:06d}.npz"
+            cls, folder, image_height, image_width, event_file_template="{:06d}.npz",
+            read_ahead=2, cropping_data=None
     ):
-        filename_iterator = os_tools.make_glob_filename_iterator(
-            os.path.join(folder, event_file_template)
+        index = EventFileIndex.from_folder(folder, event_file_template)
+        return cls(
+            index.filenames, image_height, image_width, read_ahead, index, cropping_data
         )
-        filenames = [filename for filename in filename_iterator]
-        return cls(filenames, image_height, image_width)
 
 
 class EventSequence(object):
-    """Stores events in oldes-first order."""
+    """Stores events in oldes-first order.
+
+    Events are stored in "EventColumns". The (N x 4) "_features" array is
+    kept for compatibility, but it is a read-only copy made on every
+    access, so elements should be read from and written to the "_events"
+    columns instead.
+    """
 
     def __init__(
             self, features, image_height, image_width, start_time=None, end_time=None
@@ -134,7 +464,8 @@ class EventSequence(object):
         Args:
             features: numpy array with events softed in oldest-first order. Inside,
                       rows correspond to individual events and columns to event
-                      features (x, y, timestamp, polarity)
+                      features (x, y, timestamp, polarity). It can also be
+                      "EventColumns".
 
             image_height, image_width: widht and height of the event sensor.
                                        Note, that it can not be inferred
@@ -145,18 +476,35 @@ class EventSequence(object):
                                   them from the events. Note, that it can not be
                                   inferred from the events when there is no motion.
         """
-        self._features = features
+        if not isinstance(features, EventColumns):
+            features = EventColumns.from_features(features)
+        self._events = features
         self._image_width = image_width
         self._image_height = image_height
         self._start_time = (
-            start_time if start_time is not None else features[0, TIMESTAMP_COLUMN]
+            start_time if start_time is not None else features.t[0]
         )
         self._end_time = (
-            end_time if end_time is not None else features[-1, TIMESTAMP_COLUMN]
+            end_time if end_time is not None else features.t[-1]
         )
 
+    @property
+    def _features(self):
+        features = self._events.to_features()
+        # Writes into the copy would be lost, so they raise an error.
+        features.flags.writeable = False
+        return features
+
+    @_features.setter
+    def _features(self, features):
+        self._events = EventColumns.from_features(features)
+
     def __len__(self):
-        return self._features.shape[0]
+        return len(self._events)
+
+    def chunks(self):
+        """Returns list of "EventColumns", see "ChunkedEventSequence"."""
+        return [self._events]
 
     def is_self_consistent(self):
         return (
@@ -167,33 +515,34 @@ class EventSequence(object):
         )
 
     def are_spatial_coordinates_within_range(self):
-        x = self._features[:, X_COLUMN]
-        y = self._features[:, Y_COLUMN]
+        x = self._events.x
+        y = self._events.y
         return np.all((x >= 0) & (x < self._image_width)) and np.all(
             (y >= 0) & (y < self._image_height)
         )
 
     def are_timestamps_ascending(self):
-        timestamp = self._features[:, TIMESTAMP_COLUMN]
+        timestamp = self._events.t
         return np.all((timestamp[1:] - timestamp[:-1]) >= 0)
 
     def are_timestamps_within_range(self):
-        timestamp = self._features[:, TIMESTAMP_COLUMN]
+        timestamp = self._events.t
         return np.all((timestamp <= self.end_time()) & (timestamp >= self.start_time()))
 
     def are_polarities_one_and_minus_one(self):
-        polarity = self._features[:, POLARITY_COLUMN]
+        polarity = self._events.p
         return np.all((polarity == -1) | (polarity == 1))
 
+    def crop(self, cropping_data):
+        """Crops events to the rectangle, see "crop_event_columns"."""
+        self._events = crop_event_columns(self._events, cropping_data)
+        _, _, self._image_height, self._image_width = cropping_data
+
     def flip_horizontally(self):
-        self._features[:, X_COLUMN] = (
-                self._image_width - 1 - self._features[:, X_COLUMN]
-        )
+        self._events.x = (self._image_width - 1 - self._events.x).astype(self._events.x.dtype)
 
     def flip_vertically(self):
-        self._features[:, Y_COLUMN] = (
-                self._image_height - 1 - self._features[:, Y_COLUMN]
-        )
+        self._events.y = (self._image_height - 1 - self._events.y).astype(self._events.y.dtype)
 
     def reverse(self):
         """Reverse temporal direction of the event stream.
@@ -211,13 +560,8 @@ class EventSequence(object):
         """
         if len(self) == 0:
             return
-        self._features[:, TIMESTAMP_COLUMN] = (
-                self._end_time - self._features[:, TIMESTAMP_COLUMN]
-        )
-        self._features[:, POLARITY_COLUMN] = -self._features[:, POLARITY_COLUMN]
+        self._events = _reversed_columns(self._events, self._end_time)
         self._start_time, self._end_time = 0, self._end_time - self._start_time
-        # Flip rows of the 'features' matrix, since it is sorted in oldest first.
-        self._features = np.copy(np.flipud(self._features))
 
     def duration(self):
         return self.end_time() - self.start_time()
@@ -229,18 +573,18 @@ class EventSequence(object):
         return self._end_time
 
     def min_timestamp(self):
-        return self._features[:, TIMESTAMP_COLUMN].min()
+        return self._events.t.min()
 
     def max_timestamp(self):
-        return self._features[:, TIMESTAMP_COLUMN].max()
+        return self._events.t.max()
 
     def filter_by_polarity(self, polarity, make_deep_copy=True):
-        mask = self._features[:, POLARITY_COLUMN] == polarity
+        mask = self._events.p == polarity
         return self.filter_by_mask(mask, make_deep_copy)
 
     def copy(self):
         return EventSequence(
-            features=np.copy(self._features),
+            features=self._events.copy(),
             image_height=self._image_height,
             image_width=self._image_width,
             start_time=self._start_time,
@@ -250,7 +594,7 @@ class EventSequence(object):
     def filter_by_mask(self, mask, make_deep_copy=True):
         if make_deep_copy:
             return EventSequence(
-                features=np.copy(self._features[mask]),
+                features=self._events[mask].copy(),
                 image_height=self._image_height,
                 image_width=self._image_width,
                 start_time=self._start_time,
@@ -258,7 +602,7 @@ class EventSequence(object):
             )
         else:
             return EventSequence(
-                features=self._features[mask],
+                features=self._events[mask],
                 image_height=self._image_height,
                 image_width=self._image_width,
                 start_time=self._start_time,
@@ -271,9 +615,7 @@ class EventSequence(object):
         The new sequence includes event in [start_time, start_time+duration).
         """
         end_time = start_time + duration
-        mask = (start_time <= self._features[:, TIMESTAMP_COLUMN]) & (
-                end_time > self._features[:, TIMESTAMP_COLUMN]
-        )
+        mask = (start_time <= self._events.t) & (end_time > self._events.t)
 
         event_sequence = self.filter_by_mask(mask, make_deep_copy)
         event_sequence._start_time = start_time
@@ -291,11 +633,11 @@ class EventSequence(object):
         Args:
             background: is PIL image.
         """
-        polarity = self._features[:, POLARITY_COLUMN] == 1
-        x_negative = self._features[~polarity, X_COLUMN].astype(np.int)
-        y_negative = self._features[~polarity, Y_COLUMN].astype(np.int)
-        x_positive = self._features[polarity, X_COLUMN].astype(np.int)
-        y_positive = self._features[polarity, Y_COLUMN].astype(np.int)
+        polarity = self._events.p == 1
+        x_negative = self._events.x[~polarity].astype(int)
+        y_negative = self._events.y[~polarity].astype(int)
+        x_positive = self._events.x[polarity].astype(int)
+        y_positive = self._events.y[polarity].astype(int)
 
         positive_histogram, _, _ = np.histogram2d(
             x_positive,
@@ -329,13 +671,27 @@ class EventSequence(object):
         return points_on_background
 
     def _advance_index_to_timestamp(self, timestamp, start_index=0):
-        """Returns index of the first event with timestamp > "timestamp" from "start_index"."""
-        index = start_index
-        while index < len(self):
-            if self._features[index, TIMESTAMP_COLUMN] >= timestamp:
-                return index
-            index += 1
-        return index
+        """Returns index of the first event with timestamp >= "timestamp" from "start_index"."""
+        return start_index + int(
+            np.searchsorted(self._events.t[start_index:], timestamp, side="left")
+        )
+
+    def filter_by_time_range(self, start_time, end_time, make_deep_copy=True):
+        """Returns sequence with events in [start_time, end_time).
+
+        Unlike "filter_by_timestamp", events are found by binary search
+        of the timestamps, so it does not scan the whole sequence.
+        """
+        start_index = self._advance_index_to_timestamp(start_time)
+        end_index = max(start_index, self._advance_index_to_timestamp(end_time))
+        events = self._events[start_index:end_index]
+        return EventSequence(
+            features=events.copy() if make_deep_copy else events,
+            image_height=self._image_height,
+            image_width=self._image_width,
+            start_time=start_time,
+            end_time=end_time,
+        )
 
     def split_in_two(self, timestamp):
         """Returns two sequences from splitting the original sequence in two."""
@@ -389,9 +745,8 @@ class EventSequence(object):
 
         for end_timestamp in timestamps[1:]:
             end_index = self._advance_index_to_timestamp(end_timestamp, start_index)
-            self._features[start_index:end_index, :].size == 0
             yield EventSequence(
-                features=np.copy(self._features[start_index:end_index, :]),
+                features=self._events[start_index:end_index].copy(),
                 image_height=self._image_height,
                 image_width=self._image_width,
                 start_time=start_timestamp,
@@ -415,13 +770,16 @@ class EventSequence(object):
 
     @classmethod
     def from_folder(
-            cls, folder, image_height, image_width, event_file_template="{:06d}.npz"
+            cls, folder, image_height, image_width, event_file_template="{:06d}.npz",
+            number_of_threads=None
     ):
         filename_iterator = os_tools.make_glob_filename_iterator(
             os.path.join(folder, event_file_template)
         )
         filenames = [filename for filename in filename_iterator]
-        return cls.from_npz_files(filenames, image_height, image_width)
+        return cls.from_npz_files(
+            filenames, image_height, image_width, number_of_threads=number_of_threads
+        )
 
     @classmethod
     def from_npz_files(
@@ -431,14 +789,145 @@ class EventSequence(object):
             image_width,
             start_time=None,
             end_time=None,
+            number_of_threads=None,
     ):
-        """Reads event sequence from numpy file list."""
-        if len(list_of_filenames) > 1:
-            features_list = []
-            for f in tqdm.tqdm(list_of_filenames):
-                features_list += [load_events(f)]  # for filename in list_of_filenames]
-            features = np.concatenate(features_list)
-        else:
-            features = load_events(list_of_filenames[0])
+        """Reads event sequence from numpy file list.
+
+        Numbers of events are read from the file headers first, then the
+        files are decoded by "number_of_threads" threads (by default, one
+        per CPU) straight into their rows of the output columns.
+        """
+        numbers_of_events = [
+            number_of_events_in_file(filename) for filename in list_of_filenames
+        ]
+        offsets = np.concatenate(([0], np.cumsum(numbers_of_events)))
+        coordinate_dtype = np.uint16
+        if list_of_filenames:
+            _, dtype = _read_array_header(list_of_filenames[0], "x")
+            coordinate_dtype = _coordinate_dtype(dtype)
+        events = EventColumns.empty(offsets[-1], coordinate_dtype)
+        with concurrent.futures.ThreadPoolExecutor(number_of_threads) as executor:
+            futures = [
+                executor.submit(load_events_into, filename, events[start:end])
+                for filename, start, end in zip(list_of_filenames, offsets[:-1], offsets[1:])
+            ]
+            for future in tqdm.tqdm(
+                    concurrent.futures.as_completed(futures),
+                    total=len(futures),
+                    disable=len(futures) <= 1,
+            ):
+                future.result()
+
+        return EventSequence(events, image_height, image_width, start_time, end_time)
+
+
+class ChunkedEventSequence(object):
+    """Stores events in oldest-first order as a list of "EventColumns" (chunks).
+
+    It has the interface of "EventSequence" used by the interpolation,
+    but slicing and splitting do not concatenate the chunks. Chunks are
+    never modified in place, so sub-sequences and copies share memory
+    with the original sequence. A single array is only allocated by the
+    "materialize" method.
+    """
+
+    def __init__(self, chunks, image_height, image_width, start_time, end_time):
+        """Returns object of ChunkedEventSequence class.
+
+        Args:
+            chunks: list of "EventColumns". Events of every chunk are
+                    older than events of the next chunk.
+        """
+        self._chunks = [chunk for chunk in chunks if len(chunk)]
+        self._image_height = image_height
+        self._image_width = image_width
+        self._start_time = start_time
+        self._end_time = end_time
+
+    def __len__(self):
+        return sum(len(chunk) for chunk in self._chunks)
 
-        return EventSequence(features, image_height, image_width, start_time, end_time)
+    def chunks(self):
+        return self._chunks
+
+    def materialize(self):
+        """Returns "EventSequence" with events copied into single columns."""
+        events = (
+            EventColumns.concatenate(self._chunks) if self._chunks else EventColumns.empty(0)
+        )
+        return EventSequence(
+            events, self._image_height, self._image_width, self._start_time, self._end_time
+        )
+
+    def duration(self):
+        return self.end_time() - self.start_time()
+
+    def start_time(self):
+        return self._start_time
+
+    def end_time(self):
+        return self._end_time
+
+    def min_timestamp(self):
+        return self._chunks[0].t[0]
+
+    def max_timestamp(self):
+        return self._chunks[-1].t[-1]
+
+    def copy(self):
+        return ChunkedEventSequence(
+            list(self._chunks),
+            self._image_height,
+            self._image_width,
+            self._start_time,
+            self._end_time,
+        )
+
+    def reverse(self):
+        """Reverse temporal direction of the event stream.
+
+        See "EventSequence.reverse". Reversed chunks are new arrays.
+        """
+        self._chunks = [
+            _reversed_columns(chunk, self._end_time) for chunk in reversed(self._chunks)
+        ]
+        self._start_time, self._end_time = 0, self._end_time - self._start_time
+
+    def filter_by_timestamp(self, start_time, duration, make_deep_copy=False):
+        """Returns event sequence filtered by the timestamp.
+
+        The new sequence includes event in [start_time, start_time+duration).
+        Its chunks are views of the original chunks, unless
+        "make_deep_copy" is True.
+        """
+        return self.filter_by_time_range(start_time, start_time + duration, make_deep_copy)
+
+    def filter_by_time_range(self, start_time, end_time, make_deep_copy=False):
+        """Returns sequence with events in [start_time, end_time).
+
+        See "filter_by_timestamp".
+        """
+        chunks = []
+        for chunk in self._chunks:
+            start_index, end_index = np.searchsorted(
+                chunk.t, [start_time, end_time], side="left"
+            )
+            if start_index < end_index:
+                chunk = chunk[start_index:end_index]
+                chunks.append(chunk.copy() if make_deep_copy else chunk)
+        return ChunkedEventSequence(
+            chunks, self._image_height, self._image_width, start_time, end_time
+        )
+
+    split_in_two = EventSequence.split_in_two
+    make_iterator_over_splits = EventSequence.make_iterator_over_splits
+
+    def make_sequential_iterator(self, timestamps):
+        """Returns iterator over sub-sequences of events.
+
+        See "EventSequence.make_sequential_iterator".
+        """
+        if len(timestamps) < 2:
+            raise ValueError("There should be at least two timestamps")
+        for start_timestamp, end_timestamp in zip(timestamps[:-1], timestamps[1:]):
+            yield self.filter_by_time_range(start_timestamp, end_timestamp)
@@ -1,3 +1,5 @@
+import numpy as np
+
 from timelens.common import event, image_sequence, iterator_modifiers
 
 
@@ -11,6 +13,73 @@ class HybridStorage(object):
     def get_image_size(self):
         return self._images._height, self._images._width
 
+    def number_of_pairs(self, number_of_skips=0):
+        """Returns number of pairs of boundary frames."""
+        return max(len(self._images) - 1, 0) // (number_of_skips + 1)
+
+    def get_frames(self, start_index, end_index):
+        """Returns list of frames with indices in [start_index, end_index)."""
+        end_index = min(end_index, len(self._images))
+        return [self._images[index] for index in range(start_index, end_index)]
+
+    def get_events(self, start_time, end_time):
+        """Returns events with timestamps in [start_time, end_time).
+
+        Events are found by binary search of timestamps of the in-memory
+        events, or of the event file index of the streamed events, so the
+        earlier events are not read.
+        """
+        return self._events.filter_by_time_range(start_time, end_time)
+
+    def find_pairs(self, timestamps, number_of_skips=0):
+        """Returns pairs of boundary frames around the timestamps.
+
+        Returns:
+            array with index of the pair (see "get_pair") of every
+            timestamp, or -1 for timestamps outside of the boundary frames,
+            and array with weight of the right frame of the pair, which
+            goes from 0 at the left frame to 1 at the right frame.
+        """
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        number_of_pairs = self.number_of_pairs(number_of_skips)
+        boundary_timestamps = np.asarray(self._images._timestamps, dtype=np.float64)[
+            :number_of_pairs * (number_of_skips + 1) + 1:number_of_skips + 1
+        ]
+        if number_of_pairs == 0:
+            return np.full(timestamps.shape, -1), np.zeros(timestamps.shape)
+        pair_indices = np.clip(
+            np.searchsorted(boundary_timestamps, timestamps, side="right") - 1,
+            0,
+            number_of_pairs - 1,
+        )
+        left_timestamps = boundary_timestamps[pair_indices]
+        right_timestamps = boundary_timestamps[pair_indices + 1]
+        right_weights = (timestamps - left_timestamps) / (right_timestamps - left_timestamps)
+        is_outside = (timestamps < boundary_timestamps[0]) | (timestamps > boundary_timestamps[-1])
+        pair_indices[is_outside] = -1
+        return pair_indices, right_weights
+
+    def get_pair(self, pair_index, number_of_skips=0):
+        """Returns boundary frames and events between them of the pair.
+
+        The pair is the "pair_index"-th item of
+        "make_boundary_frames_iterator" and
+        "make_interframe_events_iterator" with the same "number_of_skips".
+
+        Returns:
+            left frame, right frame and event sequence.
+        """
+        if not 0 <= pair_index < self.number_of_pairs(number_of_skips):
+            raise IndexError("Pair index {} is out of range.".format(pair_index))
+        left_index = pair_index * (number_of_skips + 1)
+        right_index = left_index + number_of_skips + 1
+        timestamps = self._images._timestamps
+        return (
+            self._images[left_index],
+            self._images[right_index],
+            self.get_events(timestamps[left_index], timestamps[right_index]),
+        )
+
     def make_interframe_events_iterator(self, number_of_skips):
         timestamps = list(self.make_boundary_timestamps_iterator(number_of_skips))
         return self._events.make_sequential_iterator(timestamps)
@@ -44,18 +113,27 @@ class HybridStorage(object):
             event_file_template="{:06d}.npz",
             image_file_template="{:06d}.png",
             cropping_data=None,
-            timestamps_file="timestamp.txt"
+            timestamps_file="timestamp.txt",
+            read_ahead=2,
+            frame_range=None
     ):
-        images = image_sequence.ImageSequence.from_folder(
-            folder=image_folder,
-            image_file_template=image_file_template,
-            timestamps_file=timestamps_file
+        """Returns storage that reads event files while iterating over them.
+
+        See "event.EventJITSequence". Files are found with the sidecar
+        index of the event folder, see "event.EventFileIndex", so events
+        outside of the "frame_range" (see "from_folders") are not read.
+        Events of every file are cropped when the file is read.
+        """
+        images = _load_images(
+            image_folder, image_file_template, timestamps_file, frame_range, cropping_data
         )
         events = event.EventJITSequence.from_folder(
             folder=event_folder,
             image_height=images._height,
             image_width=images._width,
-            event_file_template=event_file_template
+            event_file_template=event_file_template,
+            read_ahead=read_ahead,
+            cropping_data=cropping_data
         )
 
         return cls(images, events)
@@ -68,18 +146,58 @@ class HybridStorage(object):
             event_file_template="{:06d}.npz",
             image_file_template="{:06d}.png",
             cropping_data=None,
-            timestamps_file="timestamp.txt"
+            timestamps_file="timestamp.txt",
+            number_of_threads=None,
+            frame_range=None
     ):
-        images = image_sequence.ImageSequence.from_folder(
-            folder=image_folder,
-            image_file_template=image_file_template,
-            timestamps_file=timestamps_file
-        )
-        events = event.EventSequence.from_folder(
-            folder=event_folder,
-            image_height=images._height,
-            image_width=images._width,
-            event_file_template=event_file_template
+        """Returns storage with all events loaded in memory.
+
+        If "frame_range" is given as (start_index, end_index), only frames
+        with indices in [start_index, end_index) and events between their
+        timestamps are loaded.
+
+        If "cropping_data" is given as (top, left, height, width), images
+        are cropped to the rectangle when they are read, and events outside
+        of it are dropped, with coordinates of the other events shifted to
+        the rectangle. Everything downstream then works with the size of
+        the rectangle.
+        """
+        images = _load_images(
+            image_folder, image_file_template, timestamps_file, frame_range, cropping_data
         )
+        if frame_range is None:
+            events = event.EventSequence.from_folder(
+                folder=event_folder,
+                image_height=images._height,
+                image_width=images._width,
+                event_file_template=event_file_template,
+                number_of_threads=number_of_threads
+            )
+        else:
+            start_time, end_time = images._timestamps[0], images._timestamps[-1]
+            index = event.EventFileIndex.from_folder(event_folder, event_file_template)
+            events = event.EventSequence.from_npz_files(
+                index.filenames_in_time_range(start_time, end_time),
+                images._height,
+                images._width,
+                start_time,
+                end_time,
+                number_of_threads
+            )
+        if cropping_data is not None:
+            events.crop(cropping_data)
 
         return cls(images, events)
+
+
+def _load_images(image_folder, image_file_template, timestamps_file, frame_range,
+                 cropping_data=None):
+    images = image_sequence.ImageSequence.from_folder(
+        folder=image_folder,
+        image_file_template=image_file_template,
+        timestamps_file=timestamps_file,
+        cropping_data=cropping_data
+    )
+    if frame_range is not None:
+        images = images.select_frames(*frame_range)
+    return images
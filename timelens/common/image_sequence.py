@@ -12,18 +12,26 @@ import tqdm
 
 
 class ImageJITReader(object):
-    """Reads Image Just-in-Time"""
+    """Reads Image Just-in-Time
 
-    def __init__(self, filenames):
+    If "cropping_data" (top, left, height, width) is given, images are
+    cropped to the rectangle when they are read.
+    """
+
+    def __init__(self, filenames, cropping_data=None):
         self.filenames = filenames
+        self.cropping_data = cropping_data
 
     def __len__(self):
         return len(self.filenames)
 
     def __getitem__(self, index):
         f = self.filenames[index]
-        img = Image.open(f).convert("RGB")
-        return img
+        img = Image.open(f)
+        if self.cropping_data is not None:
+            top, left, height, width = self.cropping_data
+            img = img.crop((left, top, left + width, top + height))
+        return img.convert("RGB")
 
 
 class ImageSequence(object):
@@ -47,10 +55,27 @@ class ImageSequence(object):
     def make_frame_iterator(self, number_of_skips):
         return iter(self._images)
 
-    def to_folder(self, folder, file_template="{:06d}.png", timestamps_file="timestamp.txt"):
-        """Save images to image files"""
+    def select_frames(self, start_index, end_index):
+        """Returns sequence of frames with indices in [start_index, end_index).
+
+        Frames read just-in-time are not read.
+        """
+        if isinstance(self._images, ImageJITReader):
+            images = ImageJITReader(
+                self._images.filenames[start_index:end_index], self._images.cropping_data
+            )
+        else:
+            images = self._images[start_index:end_index]
+        return ImageSequence(images, self._timestamps[start_index:end_index])
+
+    def to_folder(self, folder, file_template="{:06d}.png", timestamps_file="timestamp.txt",
+                  first_index=0):
+        """Save images to image files.
+
+        Files are numbered from "first_index".
+        """
         folder = os.path.abspath(folder)
-        for image_index, image in enumerate(self._images):
+        for image_index, image in enumerate(self._images, first_index):
             filename = os.path.join(folder, "{:06d}.png".format(image_index))
             image.save(filename)
         os_tools.list_to_file(
@@ -72,14 +97,23 @@ class ImageSequence(object):
 
     @classmethod
     def from_folder(
-            cls, folder, image_file_template="frame_{:010d}.png", timestamps_file="timestamp.txt"
+            cls, folder, image_file_template="frame_{:010d}.png", timestamps_file="timestamp.txt",
+            cropping_data=None
     ):
         filename_iterator = os_tools.make_glob_filename_iterator(
             os.path.join(folder, image_file_template)
         )
         filenames = [f for f in filename_iterator]
-
-        images = ImageJITReader(filenames)
+        if cropping_data is not None and filenames:
+            top, left, height, width = cropping_data
+            # Only the header is read to get the size.
+            image_width, image_height = Image.open(filenames[0]).size
+            if not (0 <= top and 0 <= left and 0 < height and 0 < width
+                    and top + height <= image_height and left + width <= image_width):
+                raise ValueError("Cropping rectangle {} is outside of {}x{} images.".format(
+                    cropping_data, image_height, image_width))
+
+        images = ImageJITReader(filenames, cropping_data)
         timestamps = np.loadtxt(os.path.join(folder, timestamps_file)).tolist()
 
         return cls(images, timestamps)
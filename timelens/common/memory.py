@@ -0,0 +1,297 @@
+"""Memory accounting of the processing stages.
+
+Memory is tracked only while a "MemoryTracker" is activated. It is
+sampled at the end of every stage timed by "timing.stage", so the timer
+should be activated as well:
+
+    tracker = memory.MemoryTracker()
+    memory.activate(tracker)
+    timing.activate(timing.StageTimer())
+    ...
+    memory.deactivate()
+    tracker.to_json("memory_report.json")
+
+The report has the largest resident set size (RSS) and live tensor bytes
+seen at the end of every stage, sizes of the big objects, such as the
+event sequence, the output frames and the UNet activations, and
+coefficients of a linear memory model (see "predict_peak_rss_bytes").
+
+On CUDA and MPS live tensor bytes are reported by the allocator. On CPU,
+which has no such counter, they are estimated as bytes of the tracked
+buffer pool plus activations of the UNet run in the stage, and the
+report has "tensor_bytes_source" set to "estimate".
+"""
+
+import collections
+import json
+import os
+import resource
+import sys
+
+import torch as th
+from torch import nn
+
+from timelens.config import DEVICE
+
+_active_tracker = None
+
+# Names of the UNets of the networks, which activations are tracked.
+NETWORK_NAMES = [
+    "flow_network",
+    "fusion_network",
+    "flow_refinement_network",
+    "attention_network",
+]
+# Bytes per pixel of an RGB frame.
+BYTES_PER_FRAME_PIXEL = 3
+
+
+def peak_rss_bytes():
+    """Returns peak resident set size of the process in bytes."""
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes and macOS reports bytes.
+    return peak_rss if sys.platform == "darwin" else 1024 * peak_rss
+
+
+def rss_bytes():
+    """Returns current resident set size of the process in bytes.
+
+    Where "/proc" is not available (macOS), returns the peak resident
+    set size instead.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return peak_rss_bytes()
+
+
+def tensor_bytes():
+    """Returns bytes allocated by tensors on the device or None on CPU."""
+    if DEVICE.type == "cuda":
+        return th.cuda.memory_allocated()
+    if DEVICE.type == "mps":
+        return th.mps.current_allocated_memory()
+    return None
+
+
+def _nbytes(tensors):
+    if isinstance(tensors, th.Tensor):
+        return tensors.element_size() * tensors.nelement()
+    if isinstance(tensors, (list, tuple)):
+        return sum(_nbytes(tensor) for tensor in tensors)
+    return 0
+
+
+class MemoryTracker(object):
+    """Collects memory used by the processing stages in bytes."""
+
+    def __init__(self):
+        self._baseline_rss = rss_bytes()
+        self._stages = collections.OrderedDict()
+        self._sizes = collections.OrderedDict()
+        self._parameters = {}
+        self._hooks = []
+        self._pool = None
+        # Activation bytes of the last forward pass of every UNet.
+        self._activation_bytes = {}
+
+    def sample(self, name):
+        """Records memory in use at the end of the stage "name"."""
+        statistics = self._stages.setdefault(
+            name, {"count": 0, "max_rss_bytes": 0, "max_tensor_bytes": None}
+        )
+        statistics["count"] += 1
+        statistics["max_rss_bytes"] = max(statistics["max_rss_bytes"], rss_bytes())
+        live_tensor_bytes = tensor_bytes()
+        if live_tensor_bytes is None:
+            live_tensor_bytes = self._estimated_tensor_bytes(name)
+        if live_tensor_bytes is not None:
+            statistics["max_tensor_bytes"] = max(
+                statistics["max_tensor_bytes"] or 0, live_tensor_bytes
+            )
+
+    def _estimated_tensor_bytes(self, name):
+        """Returns tensor bytes in use in the stage "name" on CPU or None.
+
+        The estimate counts the buffer pool, which holds the voxel grids
+        and the network inputs, and activations of the UNet run in the
+        stage, which is named after it.
+        """
+        if self._pool is None and not self._activation_bytes:
+            return None
+        pool_bytes = self._pool.nbytes() if self._pool is not None else 0
+        return pool_bytes + self._activation_bytes.get(name, 0)
+
+    def track_buffer_pool(self, pool):
+        """Counts buffers of the "pool" in the estimate of tensor bytes on CPU."""
+        self._pool = pool
+
+    def record_size(self, name, nbytes):
+        """Records size of the object "name", keeping the largest one."""
+        self._sizes[name] = max(self._sizes.get(name, 0), nbytes)
+
+    def record_events(self, number_of_events, nbytes):
+        """Records events held in memory at once, keeping the largest number.
+
+        These are all events of the sequence, when they are loaded before
+        the interpolation, or events of the largest interval, when they
+        are streamed. Their size is recorded as "event_sequence".
+        """
+        if number_of_events >= self._parameters.get("number_of_events_in_memory", 0):
+            self._parameters["number_of_events_in_memory"] = number_of_events
+            self._sizes["event_sequence"] = nbytes
+
+    def set_parameters(self, **parameters):
+        """Sets parameters of the run, that the memory model depends on."""
+        self._parameters.update(parameters)
+
+    def track_activations(self, network):
+        """Records activations of every UNet of the "network".
+
+        Activation bytes of a UNet are the total size of outputs of its
+        convolutions in a single forward pass. It is an upper bound of
+        memory used by the activations, since some are freed before the
+        forward pass ends.
+        """
+        for name in NETWORK_NAMES:
+            unet = getattr(network, name, None)
+            if unet is not None:
+                self._track_unet(name, unet)
+
+    def _track_unet(self, name, unet):
+        activation_bytes = [0]
+
+        def reset(module, inputs):
+            activation_bytes[0] = 0
+
+        def accumulate(module, inputs, outputs):
+            activation_bytes[0] += _nbytes(outputs)
+
+        def record(module, inputs, outputs):
+            self._activation_bytes[name] = activation_bytes[0]
+            self.record_size(name + "_activations", activation_bytes[0])
+
+        self._hooks.append(unet.register_forward_pre_hook(reset))
+        for module in unet.modules():
+            if isinstance(module, nn.Conv2d):
+                self._hooks.append(module.register_forward_hook(accumulate))
+        self._hooks.append(unet.register_forward_hook(record))
+
+    def remove_hooks(self):
+        for hook in self._hooks:
+            hook.remove()
+        self._hooks = []
+
+    def coefficients(self):
+        """Returns coefficients of the memory model fitted to this run."""
+        parameters = self._parameters
+        number_of_pixels = parameters.get("height", 0) * parameters.get("width", 0)
+        number_of_events = parameters.get("number_of_events_in_memory", 0)
+        activation_bytes = max(
+            [self._sizes.get(name + "_activations", 0) for name in NETWORK_NAMES]
+        )
+        return {
+            "baseline_bytes": self._baseline_rss,
+            "bytes_per_event": (
+                self._sizes.get("event_sequence", 0) / number_of_events
+                if number_of_events else 0.0
+            ),
+            "activation_bytes_per_pixel": (
+                activation_bytes / number_of_pixels if number_of_pixels else 0.0
+            ),
+            "buffer_bytes_per_pixel": (
+                self._sizes.get("buffer_pool", 0) / number_of_pixels
+                if number_of_pixels else 0.0
+            ),
+        }
+
+    def report(self):
+        report = {
+            "parameters": self._parameters,
+            "baseline_rss_bytes": self._baseline_rss,
+            "peak_rss_bytes": peak_rss_bytes(),
+            "tensor_bytes_source": "allocator" if tensor_bytes() is not None else "estimate",
+            "stages": self._stages,
+            "sizes": self._sizes,
+            "coefficients": self.coefficients(),
+        }
+        parameters = self._parameters
+        if "number_of_frames" in parameters:
+            report["predicted_peak_rss_bytes"] = predict_peak_rss_bytes(
+                report["coefficients"],
+                parameters["height"],
+                parameters["width"],
+                parameters.get("number_of_events_in_memory", 0),
+                parameters["number_of_frames"],
+            )
+        return report
+
+    def to_json(self, filename):
+        with open(filename, "w") as f:
+            json.dump(self.report(), f, indent=2)
+
+
+def number_of_frames_in_memory(number_of_input_frames, number_of_frames_to_skip,
+                               number_of_frames_to_insert):
+    """Returns number of input and interpolated frames kept in memory."""
+    number_of_pairs = (number_of_input_frames - 1) // (number_of_frames_to_skip + 1)
+    return number_of_input_frames + number_of_pairs * number_of_frames_to_insert
+
+
+def predict_peak_rss_bytes(coefficients, height, width, number_of_events,
+                           number_of_frames):
+    """Returns peak RSS predicted by the memory model.
+
+    The model is a sum of the baseline (interpreter, libraries and
+    network weights), events loaded in memory, input and interpolated
+    frames, buffers of the network inputs and activations of the largest
+    UNet.
+
+    Args:
+        coefficients: "coefficients" of the memory report of a run on
+                      the same machine and with the same network.
+        number_of_events: number of events held in memory at once, i.e.
+                          in the sequence, or in the largest interval
+                          between boundary frames if events are streamed.
+        number_of_frames: see "number_of_frames_in_memory".
+    """
+    number_of_pixels = height * width
+    return int(
+        coefficients["baseline_bytes"]
+        + coefficients["bytes_per_event"] * number_of_events
+        + BYTES_PER_FRAME_PIXEL * number_of_pixels * number_of_frames
+        + coefficients["buffer_bytes_per_pixel"] * number_of_pixels
+        + coefficients["activation_bytes_per_pixel"] * number_of_pixels
+    )
+
+
+def activate(tracker):
+    global _active_tracker
+    _active_tracker = tracker
+
+
+def deactivate():
+    global _active_tracker
+    if _active_tracker is not None:
+        _active_tracker.remove_hooks()
+    _active_tracker = None
+
+
+def sample(name):
+    """Records memory in use at the end of the stage with the active tracker."""
+    if _active_tracker is not None:
+        _active_tracker.sample(name)
+
+
+def record_size(name, nbytes):
+    if _active_tracker is not None:
+        _active_tracker.record_size(name, nbytes)
+
+
+def record_events(event_sequence):
+    """Records events of the sequence held in memory with the active tracker."""
+    if _active_tracker is not None:
+        _active_tracker.record_events(
+            len(event_sequence), sum(chunk.nbytes for chunk in event_sequence.chunks())
+        )
@@ -0,0 +1,118 @@
+"""Profiling of a window of frames with "torch.profiler".
+
+Ranges are recorded only while a "FrameProfiler" is activated, otherwise
+"record_function" returns a context manager that does nothing:
+
+    profiler = profiling.FrameProfiler("output", first_frame=5, number_of_frames=10)
+    profiling.activate(profiler)
+    for ...:
+        with profiling.record_function("to_voxel_grid"):
+            ...
+        profiling.step()
+    profiling.deactivate()
+"""
+
+import contextlib
+import functools
+import os
+
+import torch as th
+
+from timelens.config import DEVICE
+
+_NULL_CONTEXT = contextlib.nullcontext()
+_active_profiler = None
+
+TRACE_FILENAME = "profile_trace.json"
+OPERATORS_FILENAME = "profile_operators.txt"
+
+
+class FrameProfiler(object):
+    """Profiles "number_of_frames" frames, starting from "first_frame".
+
+    When the window ends, Chrome trace of the window is saved to the
+    "TRACE_FILENAME" and table of operators sorted by the time spent in
+    them is saved to the "OPERATORS_FILENAME" in the "output_folder".
+    The trace can be opened in "chrome://tracing" or "ui.perfetto.dev".
+    """
+
+    def __init__(self, output_folder, first_frame=5, number_of_frames=10,
+                 record_shapes=True, row_limit=50):
+        self._output_folder = output_folder
+        self._row_limit = row_limit
+        activities = [th.profiler.ProfilerActivity.CPU]
+        if DEVICE.type == "cuda":
+            activities.append(th.profiler.ProfilerActivity.CUDA)
+        self._sort_by = "self_cuda_time_total" if DEVICE.type == "cuda" else "self_cpu_time_total"
+        # Frame before the window is a warmup frame of the profiler.
+        warmup = min(first_frame, 1)
+        self._profile = th.profiler.profile(
+            activities=activities,
+            schedule=th.profiler.schedule(
+                skip_first=first_frame - warmup,
+                wait=0,
+                warmup=warmup,
+                active=number_of_frames,
+                repeat=1,
+            ),
+            on_trace_ready=self._save,
+            record_shapes=record_shapes,
+        )
+
+    def _save(self, profile):
+        os.makedirs(self._output_folder, exist_ok=True)
+        profile.export_chrome_trace(os.path.join(self._output_folder, TRACE_FILENAME))
+        table = profile.key_averages(group_by_input_shape=False).table(
+            sort_by=self._sort_by, row_limit=self._row_limit
+        )
+        with open(os.path.join(self._output_folder, OPERATORS_FILENAME), "w") as f:
+            f.write(table)
+
+    def start(self):
+        self._profile.start()
+
+    def step(self):
+        self._profile.step()
+
+    def stop(self):
+        """Stops profiling, saving the results if the window is not over yet."""
+        self._profile.stop()
+
+
+def activate(profiler):
+    global _active_profiler
+    profiler.start()
+    _active_profiler = profiler
+
+
+def deactivate():
+    global _active_profiler
+    if _active_profiler is not None:
+        _active_profiler.stop()
+    _active_profiler = None
+
+
+def step():
+    """Signals the end of a frame to the active profiler."""
+    if _active_profiler is not None:
+        _active_profiler.step()
+
+
+def record_function(name):
+    """Returns context manager that records a range in the active profiler."""
+    if _active_profiler is None:
+        return _NULL_CONTEXT
+    return th.profiler.record_function(name)
+
+
+def ranged(name):
+    """Returns decorator that records calls of the function as "name" range."""
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if _active_profiler is None:
+                return function(*args, **kwargs)
+            with th.profiler.record_function(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
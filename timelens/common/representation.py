@@ -1,6 +1,7 @@
+import numpy as np
 import torch as th
 
-from timelens.common import event
+from timelens.common import profiling
 from ..config import DEVICE
 
 
@@ -19,7 +20,134 @@ def _to_lin_idx(t, x, y, W, H, B):
     return lin_idx, mask
 
 
-def to_voxel_grid(event_sequence, nb_of_time_bins=5, remapping_maps=None):
+def scaled_size(size, scale):
+    """Returns image size (height or width) reduced by "scale", at least 1."""
+    return max(int(round(size / scale)), 1)
+
+
+def scale_coordinates(coordinates, size, scale):
+    """Returns pixel coordinates in the image dimension of "size" reduced by "scale".
+
+    Centers of the pixels are aligned, as in the bilinear resizing of the
+    image to the "scaled_size".
+    """
+    return (coordinates + 0.5) * (scaled_size(size, scale) / size) - 0.5
+
+
+def _coordinates_to_tensor(coordinates):
+    # Integer coordinates are exact in float32, so the weights are the same
+    # as for float64 coordinates.
+    if np.issubdtype(coordinates.dtype, np.integer):
+        return th.from_numpy(coordinates.astype(np.float32))
+    return th.from_numpy(coordinates)
+
+
+class RemappingLUT(object):
+    """Lookup table of the remapping of event coordinates to the frame.
+
+    Remapping maps are arrays with indices [coordinate, y, x], where
+    the coordinate 0 is the x and 1 is the y coordinate in the frame of
+    the sensor pixel (x, y). For every sensor pixel the table holds frame
+    pixels of the four bilinear corners, as indices into a flattened
+    frame, and their weights. The table is built once and kept on the
+    "device", so the remapping in "to_voxel_grid" is a gather.
+
+    Corners outside of the frame have zero weight.
+    """
+
+    def __init__(self, remapping_maps, image_height, image_width, device=DEVICE):
+        remapping_maps = th.as_tensor(np.asarray(remapping_maps), dtype=th.float64)
+        self._sensor_height, self._sensor_width = remapping_maps.size()[1:]
+        self._image_height = image_height
+        self._image_width = image_width
+        x, y = remapping_maps[0].reshape(-1), remapping_maps[1].reshape(-1)
+        left_x, left_y = x.floor(), y.floor()
+        indices, weights = [], []
+        # Corners are in the order of the loops of "to_voxel_grid".
+        for lim_x in [left_x, left_x + 1]:
+            for lim_y in [left_y, left_y + 1]:
+                is_valid = (
+                    (0 <= lim_x) & (lim_x <= image_width - 1)
+                    & (0 <= lim_y) & (lim_y <= image_height - 1)
+                )
+                weight = (1 - (lim_x - x).abs()) * (1 - (lim_y - y).abs())
+                indices.append(th.where(is_valid, lim_x + lim_y * image_width, th.zeros_like(x)))
+                weights.append(th.where(is_valid, weight, th.zeros_like(weight)))
+        self.indices = th.stack(indices).long().to(device)
+        self.weights = th.stack(weights).float().to(device)
+
+    def lookup(self, x, y):
+        """Returns indices and weights of the corners of the sensor pixels.
+
+        Args:
+            x, y: arrays with coordinates of the events on the sensor.
+
+        Returns:
+            indices into the flattened frame and weights of the corners
+            with indices [corner, event]. Events outside of the sensor
+            have zero weights.
+        """
+        x, y = x.astype(np.int64), y.astype(np.int64)
+        is_on_sensor = (
+            (0 <= x) & (x < self._sensor_width) & (0 <= y) & (y < self._sensor_height)
+        )
+        pixels = th.from_numpy(np.where(is_on_sensor, x + y * self._sensor_width, 0))
+        pixels = pixels.to(self.indices.device, non_blocking=True)
+        weights = self.weights[:, pixels]
+        if not is_on_sensor.all():
+            weights = weights * th.from_numpy(is_on_sensor).to(weights.device)
+        return self.indices[:, pixels], weights
+
+    @classmethod
+    def from_file(cls, filename, image_height, image_width, device=DEVICE, scale=1):
+        """Returns table of the remapping maps saved to ".npy" file.
+
+        If "scale" is given, the table remaps events to the frame reduced
+        by "scale" (see "to_voxel_grid").
+        """
+        remapping_maps = np.load(filename)
+        if scale != 1:
+            remapping_maps = np.stack([
+                scale_coordinates(remapping_maps[0], image_width, scale),
+                scale_coordinates(remapping_maps[1], image_height, scale),
+            ])
+            image_height = scaled_size(image_height, scale)
+            image_width = scaled_size(image_width, scale)
+        return cls(remapping_maps, image_height, image_width, device)
+
+
+def _accumulate_remapped_events(voxel_grid_flat, remapping, x, y, polarity, t,
+                                nb_of_time_bins, image_size):
+    """Adds events to the voxel grid, remapping them with "RemappingLUT"."""
+    indices, weights = remapping.lookup(x, y)
+    polarity = polarity.to(weights.device)
+    t = t.to(weights.device)
+    left_t, right_t = t.floor(), t.floor() + 1
+    for corner in range(indices.size(0)):
+        for lim_t in [left_t, right_t]:
+            mask = (0 <= lim_t) & (lim_t <= nb_of_time_bins - 1)
+            lin_idx = indices[corner] + lim_t.long() * image_size
+            weight = polarity * weights[corner] * (1 - (lim_t - t).abs())
+            voxel_grid_flat.index_add_(dim=0, index=lin_idx[mask], source=weight[mask])
+
+
+def _decimate(events, fraction, random_state):
+    """Returns "fraction" of the events, sampled at regular steps from a random offset.
+
+    Every event is kept with probability "fraction", so the voxel grid of
+    the kept events scaled by 1 / "fraction" has the expected value of
+    the voxel grid of all events. Steps are in the oldest-first order,
+    so the kept events are spread uniformly over time.
+    """
+    offset = random_state.uniform()
+    number_of_kept_events = max(int(np.ceil(len(events) * fraction - offset)), 0)
+    indices = ((offset + np.arange(number_of_kept_events)) / fraction).astype(np.int64)
+    return events[indices]
+
+
+@profiling.ranged("to_voxel_grid")
+def to_voxel_grid(event_sequence, nb_of_time_bins=5, remapping_maps=None, out=None,
+                  event_budget=None, seed=0, scale=1, random_state=None):
     """Returns voxel grid representation of event steam.
 
     In voxel grid representation, temporal dimension is
@@ -27,51 +155,106 @@ def to_voxel_grid(event_sequence, nb_of_time_bins=5, remapping_maps=None):
     polarities are interpolated between two near-by bins
     using bilinear interpolation and summed up.
 
-    If event stream is empty, voxel grid will be empty.
+    If event stream is empty, voxel grid will be empty. Event stream can be
+    "EventSequence" or "event.ChunkedEventSequence".
+
+    If "out" tensor is given, the voxel grid is computed into it instead
+    of a newly allocated tensor. It can be a view, e.g. a slice of the
+    network input, but it has to be contiguous.
+
+    "remapping_maps" is a "RemappingLUT" with remapping of the event
+    coordinates to the frame. Remapping maps given as an array are
+    converted to the table on every call, so the table should be built
+    once per sequence instead.
+
+    If the sequence has more events than "event_budget", about
+    "event_budget" events are sampled (see "_decimate") and their
+    polarities are scaled to preserve the expected voxel grid. Sampling
+    with the same "seed" is deterministic. If "random_state"
+    ("numpy.random.RandomState") is given, it is used instead of the
+    "seed". It is advanced by every decimated sequence, so sampling
+    offsets of successive packets are independent.
+
+    If "scale" is given, the voxel grid is computed for the image reduced
+    by "scale" (see "scaled_size"). Event coordinates are scaled while
+    they are accumulated, so the events are not copied. The remapping
+    table should then be built for the reduced image, see
+    "RemappingLUT.from_file".
     """
-    voxel_grid = th.zeros(nb_of_time_bins,
-                          event_sequence._image_height,
-                          event_sequence._image_width,
-                          dtype=th.float32,
-                          device=DEVICE)
+    height = event_sequence._image_height
+    width = event_sequence._image_width
+    if scale != 1:
+        height, width = scaled_size(height, scale), scaled_size(width, scale)
+    if out is None:
+        voxel_grid = th.zeros(nb_of_time_bins,
+                              height,
+                              width,
+                              dtype=th.float32,
+                              device=DEVICE)
+    else:
+        voxel_grid = out.zero_()
 
-    voxel_grid_flat = voxel_grid.flatten()
+    # "view" fails instead of silently copying non-contiguous "out".
+    voxel_grid_flat = voxel_grid.view(-1)
 
     # Convert timestamps to [0, nb_of_time_bins] range.
     duration = event_sequence.duration()
     start_timestamp = event_sequence.start_time()
-    features = th.from_numpy(event_sequence._features)
-    x = features[:, event.X_COLUMN]
-    y = features[:, event.Y_COLUMN]
-    polarity = features[:, event.POLARITY_COLUMN].float()
-    t = (features[:, event.TIMESTAMP_COLUMN] - start_timestamp) * (nb_of_time_bins - 1) / duration
-    t = t.float()
+    if remapping_maps is not None and not isinstance(remapping_maps, RemappingLUT):
+        remapping_maps = RemappingLUT(
+            remapping_maps, event_sequence._image_height, event_sequence._image_width
+        )
+    if remapping_maps is not None and (
+            (remapping_maps._image_height, remapping_maps._image_width) != (height, width)):
+        raise ValueError("Remapping table is for {}x{} image, but voxel grid is {}x{}.".format(
+            remapping_maps._image_height, remapping_maps._image_width, height, width))
+    fraction = 1.0
+    if event_budget is not None and len(event_sequence) > event_budget:
+        fraction = event_budget / len(event_sequence)
+        if random_state is None:
+            random_state = np.random.RandomState(seed)
+    # Chunks of "ChunkedEventSequence" are accumulated one by one, without
+    # concatenating them.
+    for events in event_sequence.chunks():
+        if fraction < 1:
+            events = _decimate(events, fraction, random_state)
+        polarity = th.from_numpy(events.p).float()
+        if fraction < 1:
+            polarity = polarity / fraction
+        t = (th.from_numpy(events.t) - start_timestamp) * (nb_of_time_bins - 1) / duration
+        t = t.float()
+        if remapping_maps is not None:
+            _accumulate_remapped_events(
+                voxel_grid_flat, remapping_maps, events.x, events.y, polarity, t,
+                nb_of_time_bins, width * height,
+            )
+            continue
+        x = _coordinates_to_tensor(events.x)
+        y = _coordinates_to_tensor(events.y)
+        if scale != 1:
+            x = scale_coordinates(x, event_sequence._image_width, scale)
+            y = scale_coordinates(y, event_sequence._image_height, scale)
 
-    if remapping_maps is not None:
-        remapping_maps = th.from_numpy(remapping_maps)
-        x, y = remapping_maps[:, y, x]
-
-    left_t, right_t = t.floor(), t.floor() + 1
-    left_x, right_x = x.floor(), x.floor() + 1
-    left_y, right_y = y.floor(), y.floor() + 1
+        left_t, right_t = t.floor(), t.floor() + 1
+        left_x, right_x = x.floor(), x.floor() + 1
+        left_y, right_y = y.floor(), y.floor() + 1
 
-    for lim_x in [left_x, right_x]:
-        for lim_y in [left_y, right_y]:
-            for lim_t in [left_t, right_t]:
-                mask = (0 <= lim_x) & (0 <= lim_y) & (0 <= lim_t) & (lim_x <= event_sequence._image_width - 1) \
-                       & (lim_y <= event_sequence._image_height - 1) & (lim_t <= nb_of_time_bins - 1)
+        for lim_x in [left_x, right_x]:
+            for lim_y in [left_y, right_y]:
+                for lim_t in [left_t, right_t]:
+                    mask = (0 <= lim_x) & (0 <= lim_y) & (0 <= lim_t) & (lim_x <= width - 1) \
+                           & (lim_y <= height - 1) & (lim_t <= nb_of_time_bins - 1)
 
-                # we cast to long here otherwise the mask is not computed correctly
-                lin_idx = lim_x.long() \
-                          + lim_y.long() * event_sequence._image_width \
-                          + lim_t.long() * event_sequence._image_width * event_sequence._image_height
+                    # we cast to long here otherwise the mask is not computed correctly
+                    lin_idx = lim_x.long() \
+                              + lim_y.long() * width \
+                              + lim_t.long() * width * height
 
-                weight = polarity * (1 - (lim_x - x).abs()) * (1 - (lim_y - y).abs()) * (1 - (lim_t - t).abs())
+                    weight = polarity * (1 - (lim_x - x).abs()) * (1 - (lim_y - y).abs()) * (1 - (lim_t - t).abs())
 
-                voxel_grid_flat = voxel_grid_flat.to(dtype=th.float32, non_blocking=True)
-                lin_idx = lin_idx.to(dtype=th.int64, device=DEVICE, non_blocking=True)
-                weight = th.tensor(weight, dtype=th.float32, device=DEVICE)
+                    lin_idx = lin_idx.to(dtype=th.int64, device=DEVICE, non_blocking=True)
+                    weight = weight.to(dtype=th.float32, device=DEVICE)
 
-                voxel_grid_flat.index_add_(dim=0, index=lin_idx[mask], source=weight[mask].float())
+                    voxel_grid_flat.index_add_(dim=0, index=lin_idx[mask], source=weight[mask].float())
 
     return voxel_grid
@@ -0,0 +1,171 @@
+"""Runs the network only on tiles of the frame where events occurred.
+
+Static parts of the frame produce no events, and the interpolated frame
+there is close to a linear blend of the boundary frames. The frame is
+split into square tiles, and tiles with event activity are cut out with
+a margin ("halo"), which gives the network context of the neighbouring
+pixels, and interpolated in batches. The other tiles are filled with the
+blend.
+"""
+
+import collections
+import functools
+
+import torch as th
+import torch.nn.functional as F
+
+# Fields of the collated example, which are cut into tiles.
+TILED_FIELDS = [
+    ("before", "rgb_image_tensor"),
+    ("before", "voxel_grid"),
+    ("before", "reversed_voxel_grid"),
+    ("after", "rgb_image_tensor"),
+    ("after", "voxel_grid"),
+]
+
+
+def activity_map(voxel_grids, tile_size, threshold=0.0):
+    """Returns boolean map of the active tiles.
+
+    Activity of a tile is the sum of absolute values of the voxel grids
+    in it. Tiles at the bottom and right edges might be smaller than
+    "tile_size".
+
+    Args:
+        voxel_grids: list of tensors with indices
+                     [example_index, bin_index, y, x].
+        threshold: tiles with activity above it are active.
+
+    Returns:
+        tensor with indices [example_index, tile_row, tile_column].
+    """
+    activity = sum(voxel_grid.abs().sum(dim=1) for voxel_grid in voxel_grids)
+    number_of_examples, height, width = activity.size()
+    activity = F.pad(activity, (0, -width % tile_size, 0, -height % tile_size))
+    number_of_rows = activity.size(1) // tile_size
+    number_of_columns = activity.size(2) // tile_size
+    activity = activity.view(
+        number_of_examples, number_of_rows, tile_size, number_of_columns, tile_size
+    ).sum(dim=(2, 4))
+    return activity > threshold
+
+
+def extract_tiles(tensor, tile_indices, tile_size, halo):
+    """Returns tiles of the "tensor" with the halo, stacked along first dimension.
+
+    The "tensor" is padded with zeros, so all tiles have size
+    "tile_size" + 2 * "halo".
+
+    Args:
+        tensor: tensor with indices [example_index, channel_index, y, x].
+        tile_indices: list of (example_index, tile_row, tile_column).
+    """
+    height, width = tensor.size()[-2:]
+    padded = F.pad(
+        tensor, (halo, halo + (-width % tile_size), halo, halo + (-height % tile_size))
+    )
+    window_size = tile_size + 2 * halo
+    return th.stack([
+        padded[
+            example_index, :,
+            row * tile_size:row * tile_size + window_size,
+            column * tile_size:column * tile_size + window_size,
+        ]
+        for example_index, row, column in tile_indices
+    ])
+
+
+def paste_tiles(frames, tiles, tile_indices, tile_size, halo):
+    """Writes tiles without the halo into the "frames" in-place.
+
+    Args:
+        frames: tensor with indices [example_index, channel_index, y, x].
+        tiles: tensor of tiles as returned by "extract_tiles".
+    """
+    height, width = frames.size()[-2:]
+    for tile, (example_index, row, column) in zip(tiles, tile_indices):
+        top, left = row * tile_size, column * tile_size
+        tile_height = min(tile_size, height - top)
+        tile_width = min(tile_size, width - left)
+        frames[example_index, :, top:top + tile_height, left:left + tile_width] = (
+            tile[:, halo:halo + tile_height, halo:halo + tile_width]
+        )
+
+
+class TiledInterpolator(object):
+    """Interpolates frames by running the network only on the active tiles.
+
+    Numbers of all and of the computed tiles are counted in the
+    "statistics" counter under "tiles" and "computed_tiles" keys.
+    """
+
+    def __init__(self, tile_size=64, halo=16, activity_threshold=0.0,
+                 max_tiles_per_batch=16):
+        """Returns object of TiledInterpolator class.
+
+        Args:
+            tile_size: size of the tiles in pixels. The network is the
+                       most efficient, when "tile_size" + 2 * "halo" is
+                       a multiple of 32.
+            halo: margin in pixels around the tile, given to the network
+                  as context and then discarded.
+            activity_threshold: see "activity_map".
+            max_tiles_per_batch: maximum number of tiles interpolated by
+                                 the network at once.
+        """
+        self.tile_size = tile_size
+        self.halo = halo
+        self.activity_threshold = activity_threshold
+        self.max_tiles_per_batch = max_tiles_per_batch
+        self.statistics = collections.Counter()
+
+    def _make_tile_example(self, example, tile_indices):
+        tile_example = {"before": {}, "middle": {}, "after": {}}
+        for packet_name, field_name in TILED_FIELDS:
+            tile_example[packet_name][field_name] = extract_tiles(
+                example[packet_name][field_name], tile_indices, self.tile_size, self.halo
+            )
+        right_weights = example["middle"]["weight"]
+        tile_example["middle"]["weight"] = [
+            right_weights[example_index] for example_index, _, _ in tile_indices
+        ]
+        return tile_example
+
+    def interpolate(self, network, example, tier=None):
+        """Returns frames interpolated from the collated "example".
+
+        Args:
+            network: network used for the interpolation.
+            tier: class of the network (see "run_timelens.TIERS"), which
+                  "interpolate" method is called, or None to call the
+                  method of the "network".
+
+        Returns:
+            tensor with indices [example_index, channel_index, y, x].
+        """
+        interpolate = functools.partial((tier or type(network)).interpolate, network)
+        before = example["before"]["rgb_image_tensor"]
+        after = example["after"]["rgb_image_tensor"]
+        right_weight = th.as_tensor(
+            example["middle"]["weight"], dtype=before.dtype, device=before.device
+        ).view(-1, 1, 1, 1)
+        frames = (1 - right_weight) * before + right_weight * after
+        is_active = activity_map(
+            [example["before"]["voxel_grid"], example["after"]["voxel_grid"]],
+            self.tile_size,
+            self.activity_threshold,
+        )
+        tile_indices = is_active.nonzero().tolist()
+        self.statistics["tiles"] += is_active.numel()
+        self.statistics["computed_tiles"] += len(tile_indices)
+        # Tile batches have varying sizes, so the network inputs are not
+        # pooled, which would keep a set of buffers for every size.
+        pool, network.buffer_pool = network.buffer_pool, None
+        try:
+            for start in range(0, len(tile_indices), self.max_tiles_per_batch):
+                batch_indices = tile_indices[start:start + self.max_tiles_per_batch]
+                tiles = interpolate(self._make_tile_example(example, batch_indices))
+                paste_tiles(frames, tiles, batch_indices, self.tile_size, self.halo)
+        finally:
+            network.buffer_pool = pool
+        return frames
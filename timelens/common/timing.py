@@ -0,0 +1,203 @@
+"""Timing of the processing stages.
+
+Stages are timed only while a "StageTimer" is activated, otherwise
+"stage" returns a context manager that does nothing:
+
+    timer = timing.StageTimer()
+    timing.activate(timer)
+    with timing.stage("infer"):
+        ...
+    timing.deactivate()
+    timer.to_json("timing_report.json")
+"""
+
+import collections
+import contextlib
+import csv
+import json
+import math
+import time
+
+import torch as th
+
+from timelens.common import memory
+from timelens.config import DEVICE
+
+_NULL_CONTEXT = contextlib.nullcontext()
+_END_OF_ITERATION = object()
+_active_timer = None
+
+# Histogram bins are log-spaced with "_BINS_PER_OCTAVE" bins per doubling of
+# duration, starting from "_SMALLEST_DURATION" seconds. The first bin
+# collects shorter durations and the last one longer durations.
+_SMALLEST_DURATION = 1e-6
+_BINS_PER_OCTAVE = 8
+_NUMBER_OF_BINS = 2 + 30 * _BINS_PER_OCTAVE
+
+SUMMARY_FIELDS = ["count", "total", "mean", "min", "max", "p50", "p95", "p99"]
+
+
+def _synchronize():
+    """Waits for the device, so that its work is attributed to the right stage."""
+    if DEVICE.type == "mps":
+        th.mps.synchronize()
+    elif DEVICE.type == "cuda":
+        th.cuda.synchronize()
+
+
+def _bin_index(duration):
+    if duration < _SMALLEST_DURATION:
+        return 0
+    index = 1 + int(math.log2(duration / _SMALLEST_DURATION) * _BINS_PER_OCTAVE)
+    return min(index, _NUMBER_OF_BINS - 1)
+
+
+def _bin_center(index):
+    """Returns geometric center of the histogram bin."""
+    return _SMALLEST_DURATION * 2 ** ((index - 0.5) / _BINS_PER_OCTAVE)
+
+
+class _StageStatistics(object):
+    """Counters and histogram of the durations of a single stage."""
+
+    __slots__ = ("count", "total", "minimum", "maximum", "histogram")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.minimum = float("inf")
+        self.maximum = 0.0
+        self.histogram = [0] * _NUMBER_OF_BINS
+
+    def add(self, duration):
+        self.count += 1
+        self.total += duration
+        self.minimum = min(self.minimum, duration)
+        self.maximum = max(self.maximum, duration)
+        self.histogram[_bin_index(duration)] += 1
+
+    def merge(self, other):
+        self.count += other.count
+        self.total += other.total
+        self.minimum = min(self.minimum, other.minimum)
+        self.maximum = max(self.maximum, other.maximum)
+        self.histogram = [
+            first + second for first, second in zip(self.histogram, other.histogram)
+        ]
+
+    def percentile(self, percent):
+        """Returns percentile estimated from the histogram."""
+        rank = percent / 100.0 * self.count
+        cumulative_count = 0
+        for index, count in enumerate(self.histogram):
+            cumulative_count += count
+            if count and cumulative_count >= rank:
+                return min(max(_bin_center(index), self.minimum), self.maximum)
+        return self.maximum
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "total": self.total,
+            "mean": self.total / self.count,
+            "min": self.minimum,
+            "max": self.maximum,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+        }
+
+
+class StageTimer(object):
+    """Collects durations of the processing stages in seconds.
+
+    Durations are not stored, instead every stage has counters and a
+    histogram, from which percentiles are estimated.
+    """
+
+    def __init__(self):
+        self._stages = collections.OrderedDict()
+
+    def _statistics(self, name):
+        if name not in self._stages:
+            self._stages[name] = _StageStatistics()
+        return self._stages[name]
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            _synchronize()
+            self.record(name, time.perf_counter() - start_time)
+            memory.sample(name)
+
+    def record(self, name, duration):
+        self._statistics(name).add(duration)
+
+    def merge(self, other):
+        """Adds durations collected by the "other" timer."""
+        for name, statistics in other._stages.items():
+            self._statistics(name).merge(statistics)
+
+    def summary(self):
+        """Returns dictionary with statistics of every stage."""
+        return collections.OrderedDict(
+            (name, statistics.summary()) for name, statistics in self._stages.items()
+        )
+
+    def to_json(self, filename):
+        report = {
+            "stages": self.summary(),
+            "histograms": {
+                "bin_centers": [_bin_center(index) for index in range(_NUMBER_OF_BINS)],
+                "counts": {
+                    name: statistics.histogram
+                    for name, statistics in self._stages.items()
+                },
+            },
+        }
+        with open(filename, "w") as f:
+            json.dump(report, f, indent=2)
+
+    def to_csv(self, filename):
+        with open(filename, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["stage"] + SUMMARY_FIELDS)
+            for name, summary in self.summary().items():
+                writer.writerow([name] + [summary[field] for field in SUMMARY_FIELDS])
+
+
+def activate(timer):
+    global _active_timer
+    _active_timer = timer
+
+
+def deactivate():
+    global _active_timer
+    _active_timer = None
+
+
+def stage(name):
+    """Returns context manager that times the stage with the active timer."""
+    if _active_timer is None:
+        return _NULL_CONTEXT
+    return _active_timer.stage(name)
+
+
+def record(name, duration):
+    """Records "duration" of the stage measured by the caller."""
+    if _active_timer is not None:
+        _active_timer.record(name, duration)
+
+
+def iterate(iterator, name):
+    """Returns iterator that times every "next" call as the stage "name"."""
+    iterator = iter(iterator)
+    while True:
+        with stage(name):
+            item = next(iterator, _END_OF_ITERATION)
+        if item is _END_OF_ITERATION:
+            return
+        yield item
@@ -5,29 +5,108 @@ from collections import defaultdict
 from PIL import Image
 
 import torch as th
-from timelens.common import event, pytorch_tools, representation
+from timelens.common import buffer_pool, event, pytorch_tools, representation
 from torch import nn
 from torchvision import transforms
 import torch
 
 
-def initialize_transformers(number_of_bins_in_voxel_grid=5):
-    return [
+def initialize_transformers(number_of_bins_in_voxel_grid=5, pool=None, event_budget=None,
+                            remapping=None, scale=1, random_state=None):
+    """Returns transformers of a raw example to the network input.
+
+    If "scale" is given, images and voxel grids are reduced by "scale"
+    (see "downscale_images" and "representation.to_voxel_grid").
+
+    Packets with more events than "event_budget" are decimated with a
+    single "random_state" ("numpy.random.RandomState") for all packets
+    transformed by the list, so packets and pairs get independent
+    sampling offsets. If it is not given, it is seeded with 0, so runs
+    are deterministic.
+    """
+    if event_budget is not None and random_state is None:
+        random_state = np.random.RandomState(0)
+    transform_list = [
         images_to_image_tensors,
         reverse_event_stream_in_before_packet,
         lambda example: event_packets_to_voxel_grids(
-            example, number_of_bins_in_voxel_grid
+            example, number_of_bins_in_voxel_grid, pool, event_budget, remapping, scale,
+            random_state
         )
     ]
-
-
-def event_packets_to_voxel_grids(example, number_of_bins_in_voxel_grid):
+    if scale != 1:
+        transform_list.insert(0, lambda example: downscale_images(example, scale))
+    return transform_list
+
+
+def event_packets_to_voxel_grids(example, number_of_bins_in_voxel_grid, pool=None,
+                                 event_budget=None, remapping=None, scale=1,
+                                 random_state=None):
+    """Appends voxel grids of the event packets to the example.
+
+    If buffer "pool" is given, the voxel grids are computed directly
+    into slices of the pooled inputs of the fusion and flow networks.
+    Packets with more events than "event_budget" are decimated, and
+    events are remapped to the frame by "remapping"
+    ("representation.RemappingLUT") and scaled to the image reduced by
+    "scale", see "representation.to_voxel_grid". Decimation advances
+    the "random_state", if it is given.
+    """
+    if pool is not None:
+        return _event_packets_to_pooled_voxel_grids(
+            example, number_of_bins_in_voxel_grid, pool, event_budget, remapping, scale,
+            random_state
+        )
     for packet_name in ["before", "after"]:
         example[packet_name]["voxel_grid"] = representation.to_voxel_grid(
-            example[packet_name]["events"], number_of_bins_in_voxel_grid
+            example[packet_name]["events"], number_of_bins_in_voxel_grid,
+            remapping_maps=remapping, event_budget=event_budget, scale=scale,
+            random_state=random_state
         )
     example["before"]["reversed_voxel_grid"] = representation.to_voxel_grid(
-        example["before"]["reversed_events"], number_of_bins_in_voxel_grid
+        example["before"]["reversed_events"], number_of_bins_in_voxel_grid,
+        remapping_maps=remapping, event_budget=event_budget, scale=scale,
+        random_state=random_state
+    )
+    return example
+
+
+def _event_packets_to_pooled_voxel_grids(example, number_of_bins_in_voxel_grid, pool,
+                                         event_budget=None, remapping=None, scale=1,
+                                         random_state=None):
+    height = representation.scaled_size(example["before"]["events"]._image_height, scale)
+    width = representation.scaled_size(example["before"]["events"]._image_width, scale)
+    # Layout of the inputs is defined by the "_pack..." functions of the
+    # networks: fusion gets [before voxel grid, before image, after voxel grid,
+    # after image] and flow gets [before reversed voxel grid, after voxel grid].
+    fusion_input = pool.get(
+        buffer_pool.FUSION_INPUT, (1, 2 * (number_of_bins_in_voxel_grid + 3), height, width)
+    )
+    flow_input = pool.get(
+        buffer_pool.FLOW_INPUT, (2, number_of_bins_in_voxel_grid, height, width)
+    )
+    example["before"]["voxel_grid"] = representation.to_voxel_grid(
+        example["before"]["events"],
+        number_of_bins_in_voxel_grid,
+        remapping_maps=remapping,
+        out=fusion_input[0, :number_of_bins_in_voxel_grid],
+        event_budget=event_budget,
+        scale=scale,
+        random_state=random_state,
+    )
+    example["after"]["voxel_grid"] = representation.to_voxel_grid(
+        example["after"]["events"], number_of_bins_in_voxel_grid,
+        remapping_maps=remapping, out=flow_input[1], event_budget=event_budget, scale=scale,
+        random_state=random_state,
+    )
+    example["before"]["reversed_voxel_grid"] = representation.to_voxel_grid(
+        example["before"]["reversed_events"],
+        number_of_bins_in_voxel_grid,
+        remapping_maps=remapping,
+        out=flow_input[0],
+        event_budget=event_budget,
+        scale=scale,
+        random_state=random_state,
     )
     return example
 
@@ -65,7 +144,11 @@ def apply_random_flips(example):
 
 
 def collate(examples_list):
-    """Returns collated examples list."""
+    """Returns collated examples list.
+
+    Tensors of a single example are not copied, but only get the
+    batch dimension.
+    """
     batch = defaultdict(dict)
     batch['middle'] = {}
     for packet_name in ["before", "middle", "after"]:
@@ -75,9 +158,11 @@ def collate(examples_list):
             if ("tensor" in field_name or "voxel_grid" in field_name) and (
                     "std" not in field_name and "mean" not in field_name
             ):
-                batch[packet_name][field_name] = th.stack(
-                    [example[packet_name][field_name] for example in examples_list]
-                )
+                tensors = [example[packet_name][field_name] for example in examples_list]
+                if len(tensors) == 1:
+                    batch[packet_name][field_name] = tensors[0].unsqueeze(0)
+                else:
+                    batch[packet_name][field_name] = th.stack(tensors)
             else:
                 batch[packet_name][field_name] = [
                     example[packet_name][field_name] for example in examples_list
@@ -96,6 +181,24 @@ def rgb_images_to_gray(example):
     return example
 
 
+def downscale_images(example, scale):
+    """Reduces all rgb PIL images by "scale" (see "representation.scaled_size").
+
+    This transformer should be applied before converting images to
+    tensors.
+    """
+    for packet_name in ["before", "after", "middle"]:
+        if (packet_name not in example) or ("rgb_image" not in example[packet_name]):
+            continue
+        image = example[packet_name]["rgb_image"]
+        example[packet_name]["rgb_image"] = image.resize(
+            (representation.scaled_size(image.width, scale),
+             representation.scaled_size(image.height, scale)),
+            Image.BILINEAR,
+        )
+    return example
+
+
 def images_to_image_tensors(example):
     """Converts all PIL images to tensors and appends them."""
     for packet_name in ["before", "after", "middle"]:
@@ -1,4 +1,5 @@
 import torch as th
+import torch.nn.functional as F
 
 from timelens.common import pytorch_tools
 
@@ -79,3 +80,62 @@ def backwarp_2d(source, y_displacement, x_displacement):
     target.masked_fill_(out_of_boundary_mask.expand_as(target), 0)
 
     return target, out_of_boundary_mask
+
+
+def downsample(tensor, factor):
+    """Returns tensor [example_index, channel_index, y, x] downsampled by the factor.
+
+    Every output location is an average of the input locations it covers.
+    """
+    height, width = tensor.size()[-2:]
+    return F.interpolate(
+        tensor, size=(max(height // factor, 1), max(width // factor, 1)), mode="area"
+    )
+
+
+def upsample_displacement(displacement, height, width):
+    """Returns displacement field resized to (height x width).
+
+    Displacements are resized with bilinear interpolation and multiplied by the
+    resizing factor, so that they are measured in pixels of the new size.
+
+    Args:
+        displacement: tensor with indices [example_index, channel_index, y, x],
+                      where even channels are y displacements and odd channels
+                      are x displacements.
+    """
+    y_factor = float(height) / displacement.size(-2)
+    x_factor = float(width) / displacement.size(-1)
+    displacement = F.interpolate(
+        displacement, size=(height, width), mode="bilinear", align_corners=False
+    )
+    factors = th.tensor(
+        [y_factor, x_factor] * (displacement.size(1) // 2),
+        dtype=displacement.dtype,
+        device=displacement.device,
+    )
+    return displacement * factors.view(1, -1, 1, 1)
+
+
+def blend_warped_images(before, after, before_invalid, after_invalid, right_weight):
+    """Returns weighted average of two images warped to the same moment.
+
+    "before" image has weight (1 - right_weight) and "after" image has
+    weight "right_weight". Locations, which are invalid in one of the images,
+    are taken from the other image.
+
+    Args:
+        before, after: tensors with indices [example_index, channel_index, y, x].
+        before_invalid,
+        after_invalid: boolean tensors with indices [example_index, 1, y, x].
+        right_weight: list or tensor with weight of each example.
+    """
+    right_weight = th.as_tensor(
+        right_weight, dtype=before.dtype, device=before.device
+    ).view(-1, 1, 1, 1)
+    before_weight = (1 - right_weight) * (~before_invalid.to(before.device)).type(before.dtype)
+    after_weight = right_weight * (~after_invalid.to(before.device)).type(before.dtype)
+    normalization = before_weight + after_weight
+    # If location is invalid in both images, it is filled with zeros.
+    normalization = normalization.masked_fill(normalization == 0, 1)
+    return (before_weight * before + after_weight * after.to(before.device)) / normalization
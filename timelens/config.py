@@ -1,3 +1,8 @@
+import os
+
 import torch
 
-DEVICE = torch.device("mps" if torch.backends.mps.is_available() else "cpu")
\ No newline at end of file
+# "TIMELENS_DEVICE" environment variable overrides the device, e.g. to run on CPU.
+DEVICE = torch.device(
+    os.environ.get("TIMELENS_DEVICE", "mps" if torch.backends.mps.is_available() else "cpu")
+)
@@ -1,29 +1,49 @@
 import torch as th
 from timelens.superslomo import unet
 from torch import nn
+from timelens.common import buffer_pool, profiling, timing
 from timelens.config import DEVICE
 
 
-def _pack(example):
+def _pack(example, pool=None):
     device = example['before']['voxel_grid'].device
 
-    return th.cat([example['before']['voxel_grid'].to(device),
-                   example['before']['rgb_image_tensor'].to(device),
-                   example['after']['voxel_grid'].to(device),
-                   example['after']['rgb_image_tensor'].to(device)], dim=1)
+    return buffer_pool.pack(pool,
+                            buffer_pool.FUSION_INPUT,
+                            [example['before']['voxel_grid'].to(device),
+                             example['before']['rgb_image_tensor'].to(device),
+                             example['after']['voxel_grid'].to(device),
+                             example['after']['rgb_image_tensor'].to(device)], dim=1)
 
 
 class Fusion(nn.Module):
     def __init__(self):
         super(Fusion, self).__init__()
         self.fusion_network = unet.UNet(2 * 3 + 2 * 5, 3, False)
+        self.buffer_pool = None
 
+    @profiling.ranged("Fusion.run_fusion")
     def run_fusion(self, example):
-        return self.fusion_network(_pack(example))
+        network_input = _pack(example, self.buffer_pool)
+        with timing.stage("fusion_network"):
+            return self.fusion_network(network_input)
 
     def from_legacy_checkpoint(self, checkpoint_filename):
+        """Loads weights of the network from the checkpoint.
+
+        The checkpoint might contain weights of a larger network, e.g.
+        "AttentionAverage", from which only the weights of the
+        fusion network are taken.
+        """
         checkpoint = th.load(checkpoint_filename, map_location=DEVICE)
-        self.load_state_dict(checkpoint["networks"])
+        state_dict = self.state_dict()
+        self.load_state_dict({
+            name: value for name, value in checkpoint["networks"].items()
+            if name in state_dict
+        })
+
+    def interpolate(self, example):
+        return self.run_fusion(example)
 
     def run_and_pack_to_example(self, example):
         example['middle']['fusion'] = self.run_fusion(example)
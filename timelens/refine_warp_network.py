@@ -1,10 +1,10 @@
 import torch as th
-from timelens.common import warp
+from timelens.common import buffer_pool, profiling, timing, warp
 from timelens import fusion_network, warp_network
 from timelens.superslomo import unet
 
 
-def _pack_for_residual_flow_computation(example):
+def _pack_for_residual_flow_computation(example, pool=None):
     tensors = [
         example["middle"]["{}_warped".format(packet)] for packet in ["after", "before"]
     ]
@@ -14,12 +14,15 @@ def _pack_for_residual_flow_computation(example):
     device = tensors[0].device  # Prendi la device del primo tensore
     tensors = [t.to(device) for t in tensors]  # Sposta tutti i tensori sulla stessa device
 
-    return th.cat(tensors, dim=1)
+    return buffer_pool.pack(pool, buffer_pool.REFINE_INPUT, tensors, dim=1)
 
 
-def _pack_images_for_second_warping(example):
-    return th.cat(
+def _pack_images_for_second_warping(example, pool=None):
+    return buffer_pool.pack(
+        pool,
+        buffer_pool.SECOND_WARP_SOURCE,
         [example["middle"]["after_warped"], example["middle"]["before_warped"]],
+        dim=0,
     )
 
 
@@ -39,20 +42,26 @@ class RefineWarp(warp_network.Warp, fusion_network.Fusion):
         warp_network.Warp.__init__(self)
         self.fusion_network = unet.UNet(2 * 3 + 2 * 5, 3, False)
         self.flow_refinement_network = unet.UNet(9, 4, False)
+        # Downsampling factor of the flow refinement network input.
+        self.refinement_scale = 1
 
     def run_refine_warp(self, example):
         warp_network.Warp.run_and_pack_to_example(self, example)
         fusion_network.Fusion.run_and_pack_to_example(self, example)
-        residual = self.flow_refinement_network(
-            _pack_for_residual_flow_computation(example)
+        residual = self._run_displacement_network(
+            self.flow_refinement_network,
+            _pack_for_residual_flow_computation(example, self.buffer_pool),
+            self.refinement_scale,
+            "flow_refinement_network",
         )
         (after_residual, before_residual) = th.chunk(residual, 2, dim=1)
         residual = th.cat([after_residual, before_residual], dim=0)
-        refined, refined_invalid = warp.backwarp_2d(
-            source=_pack_images_for_second_warping(example),
-            y_displacement=residual[:, 0, ...],
-            x_displacement=residual[:, 1, ...],
-        )
+        with timing.stage("warping"):
+            refined, refined_invalid = warp.backwarp_2d(
+                source=_pack_images_for_second_warping(example, self.buffer_pool),
+                y_displacement=residual[:, 0, ...],
+                x_displacement=residual[:, 1, ...],
+            )
 
         (after_refined, before_refined) = th.chunk(refined, 2)
         (after_refined_invalid, before_refined_invalid) = th.chunk(
@@ -66,22 +75,45 @@ class RefineWarp(warp_network.Warp, fusion_network.Fusion):
             after_residual,
         )
 
+    @profiling.ranged("RefineWarp.run_fast")
     def run_fast(self, example):
         warp_network.Warp.run_and_pack_to_example(self, example)
         fusion_network.Fusion.run_and_pack_to_example(self, example)
-        residual = self.flow_refinement_network(
-            _pack_for_residual_flow_computation(example)
+        residual = self._run_displacement_network(
+            self.flow_refinement_network,
+            _pack_for_residual_flow_computation(example, self.buffer_pool),
+            self.refinement_scale,
+            "flow_refinement_network",
         )
         (after_residual, before_residual) = th.chunk(residual, 2, dim=1)
         residual = th.cat([after_residual, before_residual], dim=0)
-        refined, _ = warp.backwarp_2d(
-            source=_pack_images_for_second_warping(example),
-            y_displacement=residual[:, 0, ...],
-            x_displacement=residual[:, 1, ...],
-        )
+        with timing.stage("warping"):
+            refined, _ = warp.backwarp_2d(
+                source=_pack_images_for_second_warping(example, self.buffer_pool),
+                y_displacement=residual[:, 0, ...],
+                x_displacement=residual[:, 1, ...],
+            )
 
         return th.chunk(refined, 2)
 
+    def interpolate(self, example):
+        """Returns average of the boundary images after the refined warping."""
+        (
+            before_refined,
+            after_refined,
+            before_refined_invalid,
+            after_refined_invalid,
+            _,
+            _,
+        ) = self.run_refine_warp(example)
+        return warp.blend_warped_images(
+            before_refined,
+            after_refined,
+            before_refined_invalid,
+            after_refined_invalid,
+            example["middle"]["weight"],
+        )
+
     def run_and_pack_to_example(self, example):
         _pack_output_to_example(example, self.run_refine_warp(example))
 
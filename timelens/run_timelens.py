@@ -1,5 +1,8 @@
+import collections
+import json
 import os
 import sys
+import time
 from os.path import dirname, join
 from timelens.config import DEVICE
 
@@ -9,15 +12,54 @@ import torch
 
 sys.path.append(dirname(dirname(__file__)))
 import torch as th
-from timelens import attention_average_network
+from timelens import (
+    attention_average_network,
+    fusion_network,
+    refine_warp_network,
+    warp_network
+)
 from timelens.common import (
+    buffer_pool,
+    deadline_scheduler,
+    event,
     hybrid_storage,
     image_sequence,
+    memory,
     os_tools,
+    profiling,
+    representation,
+    tiling,
+    timing,
     transformers
 )
+from PIL import Image
 from torchvision import transforms
 
+# Networks ordered from the fastest to the most accurate. All of them are
+# loaded from the same checkpoint.
+TIERS = collections.OrderedDict([
+    ("fusion", fusion_network.Fusion),
+    ("warp", warp_network.Warp),
+    ("refine", refine_warp_network.RefineWarp),
+    ("attention", attention_average_network.AttentionAverage),
+])
+
+# Remapping maps of the event coordinates to the frame in the event folder,
+# see "representation.RemappingLUT".
+REMAPPING_MAPS_FILENAME = "remapping_maps.npy"
+
+# Frames computed without the network, as linear blend of boundary frames.
+BLEND_PATH = "blend"
+# Paths tried by the deadline scheduler, from the most accurate to the
+# cheapest. "warp" is skipped, since it is slower than "fusion".
+DEADLINE_PATHS = ["attention", "refine", "fusion", BLEND_PATH]
+
+# Units of the timestamps in "timestamp.txt" and their number per second.
+TIMESTAMP_UNITS = collections.OrderedDict([("s", 1.0), ("ms", 1e3), ("us", 1e6)])
+# Output frame rates giving more frames per pair of input frames are
+# rejected, since they usually come from a wrong timestamp unit.
+MAX_OUTPUT_FRAMES_PER_PAIR = 1000
+
 
 def _interpolate(
         network,
@@ -25,13 +67,38 @@ def _interpolate(
         interframe_events_iterator,
         boundary_frames_iterator,
         number_of_frames_to_interpolate,
-        output_folder
+        output_folder,
+        minimum_number_of_events=0,
+        statistics=None,
+        scheduler=None,
+        first_frame_index=0,
+        tiler=None,
 ):
+    """Interpolates frames between every pair of boundary frames.
+
+    Pairs with less than "minimum_number_of_events" events are considered
+    static: instead of running the network, the interpolated frames are
+    linear blends of the boundary frames. The numbers of interpolated and
+    blended frames are counted in "statistics" counter, if it is given.
+
+    If "scheduler" is given, it chooses the path (see "DEADLINE_PATHS")
+    used for every pair and receives latencies of the interpolated frames.
+
+    If "tiler" ("tiling.TiledInterpolator") is given, the network is run
+    only on the tiles of the frames with events.
+
+    Output frames are saved to files numbered from "first_frame_index".
+    """
+    if statistics is None:
+        statistics = collections.Counter()
     output_frames, output_timestamps = [], []
-    combined_iterator = zip(boundary_frames_iterator, interframe_events_iterator)
-    counter = 0
+    combined_iterator = zip(
+        timing.iterate(boundary_frames_iterator, "decode"),
+        timing.iterate(interframe_events_iterator, "event_slicing"),
+    )
+    counter = first_frame_index
     for (left_frame, right_frame), event_sequence in combined_iterator:
-        print("Counter: %04d" % counter)
+        memory.record_events(event_sequence)
         output_timestamps += list(
             np.linspace(
                 event_sequence.start_time(),
@@ -43,46 +110,351 @@ def _interpolate(
             number_of_frames_to_interpolate
         )
         output_frames.append(left_frame)
-        output_frames[-1].save(join(output_folder, "{:06d}.png".format(counter)))
+        with timing.stage("png_encode"):
+            output_frames[-1].save(join(output_folder, "{:06d}.png".format(counter)))
         counter += 1
+        statistics["output_frames"] += 1
 
-        for split_index, (left_events, right_events) in enumerate(iterator_over_splits):
-            print("Events left: ", len(left_events._features), "Events right: ", len(right_events._features))
-            example = _pack_to_example(
-                left_frame,
-                right_frame,
-                left_events,
-                right_events,
-                float(split_index + 1.0) / (number_of_frames_to_interpolate + 1.0),
-            )
-            example = transformers.apply_transforms(example, transform_list)
-            example = transformers.collate([example])
-
-            with torch.no_grad():
-                frame, _ = network.run_fast(example)
+        if len(event_sequence) < minimum_number_of_events:
+            path = BLEND_PATH
+        elif scheduler is not None:
+            path = scheduler.choose_path()
+        else:
+            path = None
 
-            interpolated = th.clamp(
-                frame.squeeze().to(DEVICE).detach(), 0, 1,
-            )
-            output_frames.append(transforms.ToPILImage()(interpolated))
-            output_frames[-1].save(join(output_folder, "{:06d}.png".format(counter)))
+        for split_index in range(number_of_frames_to_interpolate):
+            right_weight = float(split_index + 1.0) / (number_of_frames_to_interpolate + 1.0)
+            start_time = time.perf_counter()
+            if path == BLEND_PATH:
+                output_frames.append(_blend_boundary_frames(left_frame, right_frame, right_weight))
+                statistics["blended_frames"] += 1
+            else:
+                with timing.stage("event_slicing"):
+                    left_events, right_events = next(iterator_over_splits)
+                example = _pack_to_example(
+                    left_frame,
+                    right_frame,
+                    left_events,
+                    right_events,
+                    right_weight,
+                )
+                output_frames.append(
+                    _run_network(network, transform_list, example, path, tiler)
+                )
+            if scheduler is not None:
+                scheduler.record(path, time.perf_counter() - start_time)
+            with timing.stage("png_encode"):
+                output_frames[-1].save(join(output_folder, "{:06d}.png".format(counter)))
+            timing.record("frame", time.perf_counter() - start_time)
+            profiling.step()
             counter += 1
+            statistics["interpolated_frames"] += 1
+            statistics["output_frames"] += 1
 
     output_frames.append(right_frame)
-    output_frames[-1].save(join(output_folder, "{:06d}.png".format(counter)))
+    with timing.stage("png_encode"):
+        output_frames[-1].save(join(output_folder, "{:06d}.png".format(counter)))
     counter += 1
+    statistics["output_frames"] += 1
+    memory.record_size("output_frames", sum(
+        memory.BYTES_PER_FRAME_PIXEL * frame.width * frame.height for frame in output_frames
+    ))
 
     return output_frames, output_timestamps
 
 
-def _load_network(checkpoint_file):
-    network = attention_average_network.AttentionAverage()
+def _interpolate_at_timestamps(
+        network,
+        transform_list,
+        batch_transform_list,
+        storage,
+        timestamps,
+        number_of_frames_to_skip,
+        output_folder,
+        batch_size=1,
+        minimum_number_of_events=0,
+        statistics=None,
+        tiler=None,
+):
+    """Interpolates frames at the given timestamps.
+
+    Every timestamp is mapped to its pair of boundary frames and weight
+    (see "HybridStorage.find_pairs"). Only pairs with timestamps are
+    read, and frames of a pair are interpolated in batches of up to
+    "batch_size" frames. "transform_list" is used for a single frame and
+    "batch_transform_list", which should not use a buffer pool, for
+    larger batches. Timestamps at boundary frames are output as the
+    boundary frames, and timestamps outside of them are skipped.
+
+    Returns output frames and their timestamps, in the ascending order.
+    """
+    if statistics is None:
+        statistics = collections.Counter()
+    timestamps = np.sort(np.asarray(timestamps, dtype=np.float64))
+    pair_indices, right_weights = storage.find_pairs(timestamps, number_of_frames_to_skip)
+    statistics["skipped_timestamps"] += int((pair_indices < 0).sum())
+    targets = collections.OrderedDict()
+    for timestamp, pair_index, right_weight in zip(timestamps, pair_indices, right_weights):
+        if pair_index >= 0:
+            targets.setdefault(int(pair_index), []).append((float(timestamp), float(right_weight)))
+
+    output_frames, output_timestamps = [], []
+    for pair_index, pair_targets in targets.items():
+        with timing.stage("decode"):
+            left_frame, right_frame, event_sequence = storage.get_pair(
+                pair_index, number_of_frames_to_skip
+            )
+        memory.record_events(event_sequence)
+        for batch_start in range(0, len(pair_targets), batch_size):
+            batch = pair_targets[batch_start:batch_start + batch_size]
+            start_time = time.perf_counter()
+            examples, frames = [], []
+            for timestamp, right_weight in batch:
+                if right_weight == 0:
+                    frames.append(left_frame)
+                elif right_weight == 1:
+                    frames.append(right_frame)
+                elif len(event_sequence) < minimum_number_of_events:
+                    frames.append(_blend_boundary_frames(left_frame, right_frame, right_weight))
+                    statistics["blended_frames"] += 1
+                    statistics["interpolated_frames"] += 1
+                else:
+                    with timing.stage("event_slicing"):
+                        left_events, right_events = event_sequence.split_in_two(timestamp)
+                    examples.append(_pack_to_example(
+                        left_frame, right_frame, left_events, right_events, right_weight
+                    ))
+                    frames.append(None)
+            if examples:
+                interpolated_frames = iter(_run_network_on_batch(
+                    network,
+                    transform_list if len(examples) == 1 else batch_transform_list,
+                    examples,
+                    tiler,
+                ))
+                frames = [next(interpolated_frames) if frame is None else frame for frame in frames]
+                statistics["interpolated_frames"] += len(examples)
+            for frame, (timestamp, _) in zip(frames, batch):
+                with timing.stage("png_encode"):
+                    frame.save(join(output_folder, "{:06d}.png".format(len(output_frames))))
+                output_frames.append(frame)
+                output_timestamps.append(timestamp)
+                statistics["output_frames"] += 1
+            for _ in examples:
+                timing.record("frame", (time.perf_counter() - start_time) / len(examples))
+                profiling.step()
+    memory.record_size("output_frames", sum(
+        memory.BYTES_PER_FRAME_PIXEL * frame.width * frame.height for frame in output_frames
+    ))
+
+    return output_frames, output_timestamps
+
+
+def _run_network_on_batch(network, transform_list, examples, tiler=None):
+    """Returns list of frames interpolated by the network in one batch."""
+    # Frames are resized to the boundary frames, if the network was run
+    # at reduced resolution.
+    size = examples[0]["before"]["rgb_image"].size
+    with timing.stage("voxelize"):
+        batch = transformers.collate([
+            transformers.apply_transforms(example, transform_list) for example in examples
+        ])
+
+    with timing.stage("infer"), torch.no_grad():
+        if tiler is not None:
+            frames = tiler.interpolate(network, batch)
+        else:
+            frames = network.interpolate(batch)
+
+    with timing.stage("tensor_to_pil"):
+        frames = th.clamp(frames.to(DEVICE).detach(), 0, 1)
+        return [_to_size(transforms.ToPILImage()(frame), size) for frame in frames]
+
+
+def _to_size(image, size):
+    if image.size == size:
+        return image
+    with timing.stage("upscale"):
+        return image.resize(size, Image.BILINEAR)
+
+
+def _make_output_timestamps(storage, number_of_frames_to_skip, output_timestamps=None,
+                            output_fps=None, timestamp_unit="s"):
+    """Returns timestamps of the output frames given by a list or a frame rate.
+
+    Timestamps of frame rate "output_fps" start at the first frame of
+    the "storage" and are in "timestamp_unit", which should be the unit
+    of the timestamps of the "storage". Frame rates giving more than
+    "MAX_OUTPUT_FRAMES_PER_PAIR" frames per pair raise ValueError.
+    """
+    if output_timestamps is not None:
+        return output_timestamps
+    number_of_pairs = storage.number_of_pairs(number_of_frames_to_skip)
+    start_time = storage._images._timestamps[0]
+    end_time = storage._images._timestamps[number_of_pairs * (number_of_frames_to_skip + 1)]
+    frame_duration = TIMESTAMP_UNITS[timestamp_unit] / output_fps
+    number_of_frames = int(np.floor((end_time - start_time) / frame_duration + 1e-9)) + 1
+    if number_of_frames > MAX_OUTPUT_FRAMES_PER_PAIR * max(number_of_pairs, 1):
+        raise ValueError(
+            "{} fps gives {} output frames for {} pairs of input frames, timestamps "
+            "are probably not in \"{}\" units.".format(
+                output_fps, number_of_frames, number_of_pairs, timestamp_unit))
+    return start_time + np.arange(number_of_frames) * frame_duration
+
+
+def _run_network(network, transform_list, example, path=None, tiler=None):
+    """Returns interpolated frame as PIL image.
+
+    "path" is name of the tier which is run. If it is not given, the
+    network is run in full. If "tiler" is given, the network is run only
+    on the active tiles (see "tiling.TiledInterpolator").
+    """
+    size = example["before"]["rgb_image"].size
+    with timing.stage("voxelize"):
+        example = transformers.apply_transforms(example, transform_list)
+        example = transformers.collate([example])
+
+    with timing.stage("infer"), torch.no_grad():
+        if tiler is not None:
+            frame = tiler.interpolate(network, example, None if path is None else TIERS[path])
+        elif path is None:
+            frame = network.interpolate(example)
+        else:
+            frame = TIERS[path].interpolate(network, example)
+
+    with timing.stage("tensor_to_pil"):
+        interpolated = th.clamp(
+            frame.squeeze().to(DEVICE).detach(), 0, 1,
+        )
+        return _to_size(transforms.ToPILImage()(interpolated), size)
+
+
+def _make_deadline_scheduler(network, deadline):
+    paths = [
+        path for path in DEADLINE_PATHS
+        if path == BLEND_PATH or isinstance(network, TIERS[path])
+    ]
+    return deadline_scheduler.DeadlineScheduler(paths, deadline)
+
+
+def _blend_boundary_frames(left_frame, right_frame, right_weight):
+    return Image.blend(left_frame, right_frame, right_weight)
+
+
+def _print_statistics(statistics):
+    print("Interpolated {} frames, {} of them blended without the network".format(
+        statistics["interpolated_frames"], statistics["blended_frames"]))
+    if statistics["skipped_timestamps"]:
+        print("Skipped {} timestamps outside of the input frames".format(
+            statistics["skipped_timestamps"]))
+    if statistics["tiles"]:
+        print("Computed {} of {} tiles ({:.1%}) with the network".format(
+            statistics["computed_tiles"], statistics["tiles"],
+            statistics["computed_tiles"] / statistics["tiles"]))
+
+
+def _load_network(checkpoint_file, tier="attention", flow_scale=1, refinement_scale=1):
+    network = TIERS[tier]()
+    if isinstance(network, warp_network.Warp):
+        network.flow_scale = flow_scale
+    if isinstance(network, refine_warp_network.RefineWarp):
+        network.refinement_scale = refinement_scale
     network.from_legacy_checkpoint(checkpoint_file)
     network.to(DEVICE)
     network.eval()
     return network
 
 
+def _select_frame_range(timestamps, number_of_frames_to_skip, frame_range=None,
+                        time_range=None):
+    """Returns range of the input frames that cover the selection.
+
+    Args:
+        frame_range: (first, last) indices of the input frames. Any of
+                     them can be None, meaning the first or the last frame.
+        time_range: (start, end) timestamps, which can be None as well.
+
+    Returns:
+        (start_index, end_index) of the input frames to interpolate, with
+        the boundary frames at "start_index" and "end_index" - 1, or None
+        if there is no pair of boundary frames in the selection. The
+        range is extended to the boundary frames used without selection,
+        so that the output is the same as the part of the full output.
+    """
+    start_index, end_index = 0, len(timestamps) - 1
+    if frame_range is not None:
+        first_frame, last_frame = frame_range
+        if first_frame is not None:
+            start_index = max(start_index, first_frame)
+        if last_frame is not None:
+            end_index = min(end_index, last_frame)
+    if time_range is not None:
+        start_time, end_time = time_range
+        if start_time is not None:
+            start_index = max(
+                start_index, int(np.searchsorted(timestamps, start_time, side="right")) - 1
+            )
+        if end_time is not None:
+            end_index = min(end_index, int(np.searchsorted(timestamps, end_time, side="left")))
+    step = number_of_frames_to_skip + 1
+    start_index -= start_index % step
+    end_index = min(-(-end_index // step) * step, (len(timestamps) - 1) // step * step)
+    if end_index <= start_index:
+        return None
+    return start_index, end_index + 1
+
+
+def _load_remapping(event_folder, remapping_maps_file, height, width, scale=1):
+    """Returns remapping table of the sequence or None.
+
+    Remapping maps in the event folder take precedence over the
+    "remapping_maps_file". The table is built for the frame reduced by
+    "scale".
+    """
+    filename = os.path.join(event_folder, REMAPPING_MAPS_FILENAME)
+    if not os.path.isfile(filename):
+        filename = remapping_maps_file
+    if filename is None:
+        return None
+    return representation.RemappingLUT.from_file(filename, height, width, scale=scale)
+
+
+def _save_timing_report(timer, output_folder):
+    timer.to_json(os.path.join(output_folder, "timing_report.json"))
+    timer.to_csv(os.path.join(output_folder, "timing_report.csv"))
+
+
+def _record_memory_parameters(
+        tracker, storage, number_of_frames_to_skip, number_of_frames_to_insert
+):
+    height, width = storage.get_image_size()
+    number_of_input_frames = len(storage._images)
+    # Streamed events are not held in memory, except for the current interval,
+    # which is recorded while interpolating. Their number is in the index.
+    if isinstance(storage._events, event.EventSequence):
+        number_of_events = len(storage._events)
+        tracker.record_events(number_of_events, storage._events._events.nbytes)
+    elif storage._events._index is not None:
+        timestamps = storage._images._timestamps
+        number_of_events = storage._events._index.number_of_events(timestamps[0], timestamps[-1])
+    else:
+        number_of_events = 0
+    tracker.set_parameters(
+        height=height,
+        width=width,
+        number_of_events=number_of_events,
+        number_of_input_frames=number_of_input_frames,
+        number_of_frames_to_skip=number_of_frames_to_skip,
+        number_of_frames_to_insert=number_of_frames_to_insert,
+        number_of_frames=memory.number_of_frames_in_memory(
+            number_of_input_frames, number_of_frames_to_skip, number_of_frames_to_insert
+        ),
+    )
+    tracker.record_size(
+        "input_frames", memory.BYTES_PER_FRAME_PIXEL * height * width * number_of_input_frames
+    )
+
+
 def _pack_to_example(left_image, right_image, left_events, right_events, right_weight):
     return {
         "before": {"rgb_image": left_image, "events": left_events},
@@ -98,25 +470,166 @@ def run_recursively(
         root_output_folder,
         number_of_frames_to_skip,
         number_of_frames_to_insert,
+        minimum_number_of_events=0,
+        tier="attention",
+        flow_scale=1,
+        refinement_scale=1,
+        deadline=None,
+        timing_report=False,
+        profile_window=None,
+        memory_report=False,
+        load_all_events=False,
+        frame_range=None,
+        time_range=None,
+        output_timestamps=None,
+        output_fps=None,
+        batch_size=1,
+        event_budget=None,
+        remapping_maps_file=None,
+        cropping_data=None,
+        tile_size=None,
+        tile_halo=16,
+        tile_activity_threshold=0.0,
+        preview_scale=1,
+        timestamp_unit="s",
 ):
+    """Interpolates frames in all leaf folders of "root_image_folder".
+
+    If "deadline" in seconds is given, every pair of frames is interpolated
+    with the most accurate path expected to produce a frame within the
+    deadline. Report of the used paths and latencies is saved to the
+    "deadline_report.json" file in every output folder.
+
+    If "timing_report" is True, durations of the processing stages are
+    saved to "timing_report.json" and "timing_report.csv" files in every
+    output folder, and their totals to the same files in the
+    "root_output_folder".
+
+    If "profile_window" is given as (first_frame, number_of_frames), the
+    interpolated frames in this window are profiled with "torch.profiler".
+    Chrome trace and table of operators are saved to the
+    "root_output_folder" (see "profiling.FrameProfiler").
+
+    If "memory_report" is True, memory used by the processing stages, the
+    events, the frames and the UNet activations is saved to the
+    "memory_report.json" file in every output folder, and reports of all
+    folders to the same file in the "root_output_folder" (see
+    "memory.MemoryTracker").
+
+    Event files are read while the frames are interpolated, holding only
+    a few of them in memory. If "load_all_events" is True, all events of
+    a folder are loaded before the interpolation instead.
+
+    If "frame_range" or "time_range" is given (see "_select_frame_range"),
+    only the selected pairs of frames are loaded and interpolated in
+    every folder. Output files are numbered and timestamped as in the
+    output without the selection.
+
+    If "output_timestamps" list or "output_fps" is given, frames are
+    interpolated at these timestamps instead of inserting
+    "number_of_frames_to_insert" frames into every pair, batching up to
+    "batch_size" frames of the same pair (see
+    "_interpolate_at_timestamps"). The deadline is not supported in
+    this mode and raises ValueError. Timestamps of "output_fps" are in "timestamp_unit" (see
+    "TIMESTAMP_UNITS"), the unit of "timestamp.txt".
+
+    If "event_budget" is given, event packets with more events are
+    decimated before they are converted to voxel grids, see
+    "representation.to_voxel_grid".
+
+    Event coordinates are remapped to the frames with maps from the
+    "REMAPPING_MAPS_FILENAME" file in the event folder or, if there is no
+    such file, from the "remapping_maps_file". The maps are converted to
+    a lookup table once per folder (see "representation.RemappingLUT").
+
+    If "cropping_data" (top, left, height, width) is given, only this
+    rectangle of the frames and of the sensor is interpolated (see
+    "HybridStorage.from_folders"). Remapping maps should then be given
+    for the rectangle.
+
+    If "tile_size" is given, the network is run only on the tiles with
+    sum of absolute values of the voxel grids above the
+    "tile_activity_threshold", with "tile_halo" pixels of context, and
+    the other tiles are blended (see "tiling.TiledInterpolator").
+
+    If "preview_scale" is given, the network is run on boundary frames
+    and voxel grids reduced by "preview_scale", and the interpolated
+    frames are upscaled to the size of the boundary frames.
+
+    Returns counter with total numbers of output, interpolated and
+    blended frames, and of all and computed tiles.
+    """
+    if deadline is not None and (output_timestamps is not None or output_fps is not None):
+        raise ValueError("Deadline is not supported with output timestamps.")
     (root_image_folder, root_event_folder, root_output_folder) = [
         os.path.abspath(folder)
         for folder in [root_image_folder, root_event_folder, root_output_folder]
     ]
 
-    # here we initialize the remapping function for events
-    remapping_maps = None
-    transform_list = transformers.initialize_transformers()
-    network = _load_network(checkpoint_file)
+    # Network inputs are written into buffers that are reused for every frame.
+    pool = buffer_pool.BufferPool()
+    network = _load_network(checkpoint_file, tier, flow_scale, refinement_scale)
+    network.buffer_pool = pool
+    total_statistics = collections.Counter()
+    total_timer = timing.StageTimer()
+    memory_reports = collections.OrderedDict()
+    if profile_window is not None:
+        profiling.activate(profiling.FrameProfiler(root_output_folder, *profile_window))
     leaf_image_folders = os_tools.find_leaf_folders(root_image_folder)
     for leaf_image_folder in leaf_image_folders:
         relative_path = os.path.relpath(leaf_image_folder, root_image_folder)
+        selected_range = None
+        if frame_range is not None or time_range is not None:
+            selected_range = _select_frame_range(
+                np.loadtxt(os.path.join(leaf_image_folder, "timestamp.txt"), ndmin=1),
+                number_of_frames_to_skip,
+                frame_range,
+                time_range,
+            )
+            if selected_range is None:
+                print("Skipping {}, it has no pairs of frames in the range".format(relative_path))
+                continue
+        timer = timing.StageTimer()
+        if timing_report or memory_report:
+            timing.activate(timer)
+        tracker = memory.MemoryTracker()
+        if memory_report:
+            tracker.track_activations(network)
+            tracker.track_buffer_pool(pool)
+            memory.activate(tracker)
         print("Processing {}".format(relative_path))
         leaf_event_folder = os.path.join(root_event_folder, relative_path)
         leaf_output_folder = os.path.join(root_output_folder, relative_path)
-        storage = hybrid_storage.HybridStorage.from_folders(
-            leaf_event_folder, leaf_image_folder, "*.npz", "*.png"
+        with timing.stage("load"):
+            if load_all_events:
+                storage = hybrid_storage.HybridStorage.from_folders(
+                    leaf_event_folder, leaf_image_folder, "*.npz", "*.png",
+                    cropping_data=cropping_data, frame_range=selected_range
+                )
+            else:
+                storage = hybrid_storage.HybridStorage.from_folders_jit(
+                    leaf_event_folder, leaf_image_folder, "*.npz", "*.png",
+                    cropping_data=cropping_data, frame_range=selected_range
+                )
+            remapping = _load_remapping(
+                leaf_event_folder, remapping_maps_file, *storage.get_image_size(),
+                scale=preview_scale
+            )
+        # Decimation of the event packets is deterministic for every folder.
+        random_state = np.random.RandomState(0)
+        transform_list = transformers.initialize_transformers(
+            pool=pool, event_budget=event_budget, remapping=remapping, scale=preview_scale,
+            random_state=random_state
+        )
+        # Pooled voxel grids are computed into the inputs of a single example.
+        batch_transform_list = transformers.initialize_transformers(
+            event_budget=event_budget, remapping=remapping, scale=preview_scale,
+            random_state=random_state
         )
+        if memory_report:
+            _record_memory_parameters(
+                tracker, storage, number_of_frames_to_skip, number_of_frames_to_insert
+            )
         interframe_events_iterator = storage.make_interframe_events_iterator(
             number_of_frames_to_skip
         )
@@ -126,22 +639,91 @@ def run_recursively(
         print("Processing {}".format(leaf_output_folder))
         os.makedirs(leaf_output_folder, exist_ok=True)
 
-        output_frames, output_timestamps = _interpolate(
-            network,
-            transform_list,
-            interframe_events_iterator,
-            boundary_frames_iterator,
-            number_of_frames_to_insert,
-            leaf_output_folder
-        )
+        is_timestamps_mode = output_timestamps is not None or output_fps is not None
+        # Frames at output timestamps are numbered from 0 in both of the
+        # outputs, since they are not aligned to the input frames.
+        first_frame_index = 0
+        if selected_range is not None and not is_timestamps_mode:
+            first_frame_index = (
+                selected_range[0] // (number_of_frames_to_skip + 1) * (number_of_frames_to_insert + 1)
+            )
+        statistics = collections.Counter()
+        scheduler = None
+        if deadline is not None:
+            scheduler = _make_deadline_scheduler(network, deadline)
+        tiler = None
+        if tile_size is not None:
+            tiler = tiling.TiledInterpolator(tile_size, tile_halo, tile_activity_threshold)
+        if is_timestamps_mode:
+            output_frames, leaf_output_timestamps = _interpolate_at_timestamps(
+                network,
+                transform_list,
+                batch_transform_list,
+                storage,
+                _make_output_timestamps(
+                    storage, number_of_frames_to_skip, output_timestamps, output_fps,
+                    timestamp_unit
+                ),
+                number_of_frames_to_skip,
+                leaf_output_folder,
+                batch_size,
+                minimum_number_of_events,
+                statistics,
+                tiler,
+            )
+        else:
+            output_frames, leaf_output_timestamps = _interpolate(
+                network,
+                transform_list,
+                interframe_events_iterator,
+                boundary_frames_iterator,
+                number_of_frames_to_insert,
+                leaf_output_folder,
+                minimum_number_of_events,
+                statistics,
+                scheduler,
+                first_frame_index,
+                tiler,
+            )
+        if tiler is not None:
+            statistics.update(tiler.statistics)
+        _print_statistics(statistics)
+        if scheduler is not None:
+            print(scheduler)
+            scheduler.to_file(os.path.join(leaf_output_folder, "deadline_report.json"))
+        total_statistics.update(statistics)
         output_image_sequence = image_sequence.ImageSequence(
-            output_frames, output_timestamps
+            output_frames, leaf_output_timestamps
         )
 
         input_image_sequence = storage._images.skip_and_repeat(number_of_frames_to_skip, number_of_frames_to_insert)
-        output_image_sequence.to_folder(leaf_output_folder, file_template="frame_{:06d}.png")
-        output_image_sequence.to_video(os.path.join(leaf_output_folder, "interpolated.mp4"))
-        input_image_sequence.to_video(os.path.join(leaf_output_folder, "input.mp4"))
+        with timing.stage("png_encode"):
+            output_image_sequence.to_folder(
+                leaf_output_folder, file_template="frame_{:06d}.png", first_index=first_frame_index
+            )
+        with timing.stage("video_encode"):
+            output_image_sequence.to_video(os.path.join(leaf_output_folder, "interpolated.mp4"))
+            input_image_sequence.to_video(os.path.join(leaf_output_folder, "input.mp4"))
+        timing.deactivate()
+        memory.deactivate()
+        if timing_report:
+            _save_timing_report(timer, leaf_output_folder)
+            total_timer.merge(timer)
+        if memory_report:
+            tracker.record_size("buffer_pool", pool.nbytes())
+            tracker.to_json(os.path.join(leaf_output_folder, "memory_report.json"))
+            memory_reports[relative_path] = tracker.report()
+    profiling.deactivate()
+    print("Total:")
+    _print_statistics(total_statistics)
+    if timing_report:
+        os.makedirs(root_output_folder, exist_ok=True)
+        _save_timing_report(total_timer, root_output_folder)
+    if memory_report:
+        os.makedirs(root_output_folder, exist_ok=True)
+        with open(os.path.join(root_output_folder, "memory_report.json"), "w") as f:
+            json.dump(memory_reports, f, indent=2)
+    return total_statistics
 
 
 @click.command()
@@ -151,6 +733,80 @@ def run_recursively(
 @click.argument("root_output_folder", type=click.Path(exists=False))
 @click.argument("number_of_frames_to_skip", default=1)
 @click.argument("number_of_frames_to_insert", default=1)
+@click.option("--minimum-number-of-events", default=0, show_default=True,
+              help="Pairs of frames with fewer events in between are blended "
+                   "linearly instead of being interpolated by the network.")
+@click.option("--tier", type=click.Choice(list(TIERS)), default="attention",
+              show_default=True,
+              help="Network used for the interpolation. \"fusion\" is the fastest "
+                   "and \"attention\" is the most accurate.")
+@click.option("--flow-scale", type=click.Choice(["1", "2", "4"]), default="1",
+              show_default=True,
+              help="Optical flow is estimated at resolution reduced by this factor.")
+@click.option("--refinement-scale", type=click.Choice(["1", "2", "4"]), default="1",
+              show_default=True,
+              help="Flow refinement is estimated at resolution reduced by this factor.")
+@click.option("--deadline-ms", type=float, default=None,
+              help="Per-frame latency budget. If given, cheaper networks are "
+                   "used for the pairs of frames when the budget is at risk.")
+@click.option("--timing-report", is_flag=True,
+              help="Save durations of the processing stages to "
+                   "\"timing_report.json\" and \"timing_report.csv\" files.")
+@click.option("--profile", is_flag=True,
+              help="Profile a window of interpolated frames with torch.profiler and "
+                   "save Chrome trace and table of operators to the output folder.")
+@click.option("--profile-first-frame", default=5, show_default=True,
+              help="Index of the first interpolated frame that is profiled.")
+@click.option("--profile-number-of-frames", default=10, show_default=True,
+              help="Number of interpolated frames that are profiled.")
+@click.option("--memory-report", is_flag=True,
+              help="Save memory used by the processing stages, events, frames and "
+                   "network activations to \"memory_report.json\" files.")
+@click.option("--load-all-events", is_flag=True,
+              help="Load all events of a folder in memory before the interpolation, "
+                   "instead of reading event files while interpolating.")
+@click.option("--start-time", type=float, default=None,
+              help="Interpolate only frames from this timestamp (in units of "
+                   "\"timestamp.txt\").")
+@click.option("--end-time", type=float, default=None,
+              help="Interpolate only frames until this timestamp.")
+@click.option("--start-frame", type=int, default=None,
+              help="Interpolate only frames from this input frame index.")
+@click.option("--end-frame", type=int, default=None,
+              help="Interpolate only frames until this input frame index (inclusive).")
+@click.option("--output-timestamps-file", type=click.Path(exists=True), default=None,
+              help="Interpolate frames at timestamps from this file, one per line, "
+                   "instead of inserting frames into every pair.")
+@click.option("--output-fps", type=float, default=None,
+              help="Interpolate frames at this frame rate (see --timestamp-unit), "
+                   "instead of inserting frames into every pair.")
+@click.option("--timestamp-unit", type=click.Choice(list(TIMESTAMP_UNITS)), default="s",
+              show_default=True,
+              help="Unit of the timestamps in \"timestamp.txt\", used with --output-fps.")
+@click.option("--batch-size", default=1, show_default=True,
+              help="Number of frames of a pair interpolated in one batch with "
+                   "--output-timestamps-file or --output-fps.")
+@click.option("--event-budget", type=int, default=None,
+              help="Maximum number of events converted to a voxel grid. Denser event "
+                   "packets are subsampled, preserving the expected voxel grid.")
+@click.option("--remapping-maps", type=click.Path(exists=True), default=None,
+              help="\".npy\" file with maps of the event coordinates to the frames, used "
+                   "for folders without \"remapping_maps.npy\" file.")
+@click.option("--roi", type=int, nargs=4, default=None,
+              metavar="TOP LEFT HEIGHT WIDTH",
+              help="Interpolate only this rectangle of the frames and of the sensor.")
+@click.option("--tile-size", type=int, default=None,
+              help="Run the network only on tiles of this size with events, and blend "
+                   "the boundary frames elsewhere.")
+@click.option("--tile-halo", default=16, show_default=True,
+              help="Pixels around every tile given to the network as context.")
+@click.option("--tile-activity-threshold", default=0.0, show_default=True,
+              help="Tiles with sum of absolute values of the voxel grids up to this "
+                   "threshold are blended.")
+@click.option("--preview-scale", type=click.FloatRange(min=1), default=1.0,
+              show_default=True,
+              help="Run the network at resolution reduced by this factor and upscale "
+                   "the interpolated frames, for quick previews.")
 def main(
         checkpoint_file,
         root_event_folder,
@@ -158,7 +814,41 @@ def main(
         root_output_folder,
         number_of_frames_to_skip,
         number_of_frames_to_insert,
+        minimum_number_of_events,
+        tier,
+        flow_scale,
+        refinement_scale,
+        deadline_ms,
+        timing_report,
+        profile,
+        profile_first_frame,
+        profile_number_of_frames,
+        memory_report,
+        load_all_events,
+        start_time,
+        end_time,
+        start_frame,
+        end_frame,
+        output_timestamps_file,
+        output_fps,
+        timestamp_unit,
+        batch_size,
+        event_budget,
+        remapping_maps,
+        roi,
+        tile_size,
+        tile_halo,
+        tile_activity_threshold,
+        preview_scale,
 ):
+    if output_timestamps_file is not None and output_fps is not None:
+        raise click.UsageError(
+            "Only one of --output-timestamps-file and --output-fps can be given.")
+    if (output_timestamps_file is not None or output_fps is not None) and deadline_ms is not None:
+        raise click.UsageError("--deadline-ms is not supported with output timestamps.")
+    output_timestamps = None
+    if output_timestamps_file is not None:
+        output_timestamps = np.loadtxt(output_timestamps_file, ndmin=1)
     run_recursively(
         checkpoint_file,
         root_event_folder,
@@ -166,6 +856,28 @@ def main(
         root_output_folder,
         number_of_frames_to_skip,
         number_of_frames_to_insert,
+        minimum_number_of_events,
+        tier,
+        int(flow_scale),
+        int(refinement_scale),
+        deadline_ms / 1000.0 if deadline_ms is not None else None,
+        timing_report,
+        (profile_first_frame, profile_number_of_frames) if profile else None,
+        memory_report,
+        load_all_events,
+        (start_frame, end_frame) if start_frame is not None or end_frame is not None else None,
+        (start_time, end_time) if start_time is not None or end_time is not None else None,
+        output_timestamps,
+        output_fps,
+        batch_size,
+        event_budget,
+        remapping_maps,
+        roi,
+        tile_size,
+        tile_halo,
+        tile_activity_threshold,
+        preview_scale,
+        timestamp_unit,
     )
 
 
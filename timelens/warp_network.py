@@ -1,19 +1,25 @@
 import torch as th
 from timelens.superslomo import unet
 from torch import nn
-from timelens.common import warp
+from timelens.common import buffer_pool, profiling, timing, warp
 from timelens.config import DEVICE
 
 
-def _pack_voxel_grid_for_flow_estimation(example):
-    return th.cat(
-        [example["before"]["reversed_voxel_grid"], example["after"]["voxel_grid"]]
+def _pack_voxel_grid_for_flow_estimation(example, pool=None):
+    return buffer_pool.pack(
+        pool,
+        buffer_pool.FLOW_INPUT,
+        [example["before"]["reversed_voxel_grid"], example["after"]["voxel_grid"]],
+        dim=0,
     )
 
 
-def _pack_images_for_warping(example):
-    return th.cat(
-        [example["before"]["rgb_image_tensor"], example["after"]["rgb_image_tensor"]]
+def _pack_images_for_warping(example, pool=None):
+    return buffer_pool.pack(
+        pool,
+        buffer_pool.WARP_SOURCE,
+        [example["before"]["rgb_image_tensor"], example["after"]["rgb_image_tensor"]],
+        dim=0,
     )
 
 
@@ -32,18 +38,51 @@ class Warp(nn.Module):
     def __init__(self):
         super(Warp, self).__init__()
         self.flow_network = unet.UNet(5, 2, False)
+        # Optional "buffer_pool.BufferPool" for the inputs of the networks.
+        self.buffer_pool = None
+        # Downsampling factor of the flow network input. Optical flow is
+        # smooth, so it can be estimated at reduced resolution and upsampled.
+        self.flow_scale = 1
 
     def from_legacy_checkpoint(self, checkpoint_filename):
+        """Loads weights of the network from the checkpoint.
+
+        The checkpoint might contain weights of a larger network, e.g.
+        "AttentionAverage", from which only the weights of the
+        sub-networks of this network are taken.
+        """
         checkpoint = th.load(checkpoint_filename, map_location=DEVICE)
-        self.load_state_dict(checkpoint["networks"])
+        state_dict = self.state_dict()
+        self.load_state_dict({
+            name: value for name, value in checkpoint["networks"].items()
+            if name in state_dict
+        })
+
+    def _run_displacement_network(self, network, network_input, scale, stage_name):
+        """Returns displacements estimated by "network" at 1 / "scale" resolution."""
+        if scale == 1:
+            with timing.stage(stage_name):
+                return network(network_input)
+        height, width = network_input.size()[-2:]
+        network_input = warp.downsample(network_input, scale)
+        with timing.stage(stage_name):
+            displacement = network(network_input)
+        return warp.upsample_displacement(displacement, height, width)
 
+    @profiling.ranged("Warp.run_warp")
     def run_warp(self, example):
-        flow = self.flow_network(_pack_voxel_grid_for_flow_estimation(example))
-        warped, warped_invalid = warp.backwarp_2d(
-            source=_pack_images_for_warping(example),
-            y_displacement=flow[:, 0, ...],
-            x_displacement=flow[:, 1, ...],
+        flow = self._run_displacement_network(
+            self.flow_network,
+            _pack_voxel_grid_for_flow_estimation(example, self.buffer_pool),
+            self.flow_scale,
+            "flow_network",
         )
+        with timing.stage("warping"):
+            warped, warped_invalid = warp.backwarp_2d(
+                source=_pack_images_for_warping(example, self.buffer_pool),
+                y_displacement=flow[:, 0, ...],
+                x_displacement=flow[:, 1, ...],
+            )
         (before_flow, after_flow) = th.chunk(flow, chunks=2)
         (before_warped, after_warped) = th.chunk(warped, chunks=2)
         (before_warped_invalid, after_warped_invalid) = th.chunk(
@@ -58,6 +97,24 @@ class Warp(nn.Module):
             after_warped_invalid,
         )
     
+    def interpolate(self, example):
+        """Returns average of the boundary images warped to the middle."""
+        (
+            before_warped,
+            after_warped,
+            _,
+            _,
+            before_warped_invalid,
+            after_warped_invalid,
+        ) = self.run_warp(example)
+        return warp.blend_warped_images(
+            before_warped,
+            after_warped,
+            before_warped_invalid,
+            after_warped_invalid,
+            example["middle"]["weight"],
+        )
+
     def run_and_pack_to_example(self, example):
         _pack_output_to_example(example, self.run_warp(example))
 
@@ -36,13 +36,15 @@ def viz_video(folder, number_of_skips, viz):
     it3 = hybrid.make_boundary_frames_iterator(number_of_skips)
     total = len(hybrid._images._timestamps) - 1
     for events, (left_ts, right_ts), (left_img, right_img) in tqdm(zip(it1, it2, it3), total=total):
+        # Streaming reader yields chunked sequences, copy events to a single array.
+        events = events.materialize()
         #check events are in [left_ts, right_ts]
         start_ts = events._start_time
         end_ts = events._end_time
-        assert events._features[0, 2] >= start_ts
-        assert events._features[-1, 2] <= end_ts
-        assert events._features[0, 2] >= left_ts
-        assert events._features[-1, 2] <= right_ts
+        assert events._events.t[0] >= start_ts
+        assert events._events.t[-1] <= end_ts
+        assert events._events.t[0] >= left_ts
+        assert events._events.t[-1] <= right_ts
 
         assert start_ts == left_ts
         assert end_ts == right_ts